@@ -0,0 +1,750 @@
+#!/usr/bin/env python3
+"""
+Benchmarks for the post generation script.
+Runs offline; no API calls are made.
+
+    python scripts/benchmark.py matcher
+    python scripts/benchmark.py pipeline --places 12 --baseline scripts/benchmark_baseline.json
+    python scripts/benchmark.py startup --budget-ms 100
+    python scripts/benchmark.py render --posts 10000
+    python scripts/benchmark.py corpus --articles 2000
+    python scripts/benchmark.py trends --places 5000
+"""
+
+import argparse
+import contextlib
+import itertools
+import json
+import math
+import os
+import random
+import re
+import subprocess
+import sys
+import tempfile
+import time
+import types
+import zlib
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+import corpus  # noqa: E402
+import generate_post  # noqa: E402
+import http_client  # noqa: E402
+import trend_analytics  # noqa: E402
+from ratelimit import configure_limiter  # noqa: E402
+from render import render_post  # noqa: E402
+from replay import RECORD, REPLAY, Fixtures, Replay, StandInServer  # noqa: E402
+from sentences import iter_sentences  # noqa: E402
+from trends import TrendScorer, build_keyword  # noqa: E402
+
+PIPELINE_STAGES = ("trend sweep", "wiki fetch", "extraction", "image search", "rendering")
+
+# Packages that importing generate_post must not load (they are imported on first use)
+DEFERRED_MODULES = ("numpy", "pandas", "pytrends", "wikipedia", "requests", "frontmatter", "yaml", "PIL")
+
+_IMPORT_TIME_RE = re.compile(r"^import time:\s+(\d+) \|\s+(\d+) \| (\s*)(\S+)$")
+
+# Vocabulary for synthetic article text
+FILLER_WORDS = (
+    "the city was home to a large population of workers who moved there from across "
+    "the region during the early years of its growth and many of the buildings that "
+    "still stand today were designed by local architects"
+).split()
+
+
+def make_article(num_sentences, place_name="Detroit", seed=0):
+    """
+    Build a synthetic article with a mix of keyword and filler sentences.
+    """
+    rng = random.Random(seed)
+    keywords = generate_post.HISTORICAL_KEYWORDS + generate_post.CHARACTERISTIC_KEYWORDS
+    sentences = []
+    for _ in range(num_sentences):
+        words = rng.sample(FILLER_WORDS, 12)
+        if rng.random() < 0.3:
+            words.insert(rng.randrange(len(words)), rng.choice(keywords))
+        if rng.random() < 0.3:
+            words.insert(0, place_name)
+        sentences.append(" ".join(words).capitalize())
+    return ". ".join(sentences) + "."
+
+
+def baseline_historical_sentences(wiki_text, place_name, max_events=None):
+    # Previous implementation: split the whole text, then one substring scan
+    # per keyword per sentence
+    found = []
+    for sentence in re.split(r'[.!?]+', wiki_text):
+        sentence = sentence.strip()
+        if len(sentence) < 30:
+            continue
+        sentence_lower = sentence.lower()
+        for keyword in generate_post.HISTORICAL_KEYWORDS:
+            if keyword in sentence_lower:
+                if place_name.lower() in sentence_lower:
+                    found.append(sentence)
+                    break
+        if max_events is not None and len(found) >= max_events:
+            break
+    return found
+
+
+def timed(func, *args, repeat=5):
+    """
+    Returns the best wall time of `repeat` calls, in seconds.
+    """
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(*args)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+# Article text and the sentences it must be split into
+SENTENCE_CASES = [
+    ("Mayor Coleman A. Young took office in 1974. The city changed.",
+     ["Mayor Coleman A. Young took office in 1974", "The city changed"]),
+    ("John F. Kennedy visited.", ["John F. Kennedy visited"]),
+    ("J. R. R. Tolkien wrote it. It sold well.", ["J. R. R. Tolkien wrote it", "It sold well"]),
+    ("The city changed. J. Smith was mayor.", ["The city changed", "J. Smith was mayor"]),
+    ("It was damaged in World War I. In 1920 it was rebuilt.",
+     ["It was damaged in World War I", "In 1920 it was rebuilt"]),
+    ("They chose Plan B. The town was evacuated.", ["They chose Plan B", "The town was evacuated"]),
+    ("The U.S. Army arrived, e.g. in Jan. 1942. It left.",
+     ["The U.S. Army arrived, e.g. in Jan. 1942", "It left"]),
+]
+
+
+def check_sentences():
+    """
+    Split the SENTENCE_CASES texts. Returns the number of texts split differently.
+    """
+    mismatches = 0
+    for text, expected in SENTENCE_CASES:
+        sentences = list(iter_sentences(text))
+        if sentences != expected:
+            print(f"Sentences differ for {text!r}: {sentences}")
+            mismatches += 1
+    return mismatches
+
+
+def bench_matcher(args):
+    """
+    Compare the per-keyword event extraction loop with the compiled keyword
+    matcher and streaming sentence segmentation.
+    Exits with status 1 if a SENTENCE_CASES text is split differently.
+    """
+    mismatches = check_sentences()
+    print(f"{'sentences':>10} {'task':<22} {'baseline':>10} {'matcher':>10} {'speedup':>8}")
+    for num_sentences in args.sizes:
+        text = make_article(num_sentences)
+        rows = [
+            # Baseline: every matching sentence; now: the 5 best of the whole article
+            ("top 5 events", baseline_historical_sentences, generate_post.extract_historical_events,
+             (text, "Detroit")),
+        ]
+        for task, baseline, candidate, call_args in rows:
+            base = timed(baseline, *call_args, repeat=args.repeat)
+            new = timed(candidate, *call_args, repeat=args.repeat)
+            print(f"{num_sentences:>10} {task:<22} {base * 1000:>8.2f}ms {new * 1000:>8.2f}ms {base / new:>7.1f}x")
+    if mismatches:
+        return 1
+    return 0
+
+
+def calibrate(repeat=5):
+    """
+    Time a fixed pure-Python workload, in seconds.
+    Throughputs are multiplied by it so baselines carry over between machines.
+    """
+    return timed(lambda: sorted(str(i * 7919 % 10007) for i in range(100000)), repeat=repeat)
+
+
+@contextlib.contextmanager
+def patched(obj, **attributes):
+    """
+    Temporarily set attributes of an object (missing ones are removed again).
+    """
+    missing = object()
+    saved = {name: getattr(obj, name, missing) for name in attributes}
+    for name, value in attributes.items():
+        setattr(obj, name, value)
+    try:
+        yield obj
+    finally:
+        for name, value in saved.items():
+            if value is missing:
+                delattr(obj, name)
+            else:
+                setattr(obj, name, value)
+
+
+@contextlib.contextmanager
+def quiet():
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        yield
+
+
+def make_places(count):
+    """
+    The configured places, followed by synthetic ones if more are needed.
+    """
+    places = [place.to_dict() for place in itertools.islice(generate_post.PLACES, count)]
+    for i in range(len(places), count):
+        places.append({
+            "name": f"Synthetic Place {i + 1}",
+            "location": "Nowhere",
+            "description": f"Synthetic Place {i + 1} was once a busy mining town, now abandoned."
+        })
+    return places
+
+
+def synthetic_trends(fixtures, places):
+    """
+    Record deterministic Trends batch results for the places.
+    """
+    keywords = [build_keyword(place["name"], place.get("location", "")) for place in places]
+    anchor = generate_post.trend_anchor()
+    scorer = TrendScorer(None)
+    for batch in scorer.make_batches(keywords, anchor):
+        means = {keyword: float(zlib.crc32(keyword.encode("utf-8")) % 100 + 1) for keyword in batch}
+        fixtures.put("TrendScorer.fetch_batch", json.dumps({"batch": batch}), means)
+
+
+def synthetic_wikipedia(places, num_sentences):
+    """
+    Stand-in for the wikipedia module that returns synthetic articles.
+    """
+    pages = {}
+    for i, place in enumerate(places):
+        content = make_article(num_sentences, place["name"], seed=i)
+        page = types.SimpleNamespace(
+            title=place["name"],
+            url=f"https://en.wikipedia.org/wiki/{generate_post.make_slug(place['name'])}",
+            summary=content[:600],
+            content=content,
+            revision_id=zlib.crc32(place["name"].encode("utf-8"))
+        )
+        pages[place["name"].lower()] = page
+        pages[f"{place['name']}, {place.get('location', '')}".lower()] = page
+
+    def page(title, auto_suggest=True):
+        try:
+            return pages[title.lower()]
+        except KeyError:
+            raise PageError(title)
+
+    class PageError(Exception):
+        pass
+
+    class DisambiguationError(Exception):
+        options = []
+
+    exceptions = types.SimpleNamespace(PageError=PageError, DisambiguationError=DisambiguationError)
+    return types.SimpleNamespace(page=page, exceptions=exceptions)
+
+
+def run_pipeline(places, fixtures, recorded, args):
+    """
+    Run every pipeline stage for all places in a fresh cache and posts directory.
+    Returns a dictionary of stage -> seconds.
+    """
+    timings = {}
+    with tempfile.TemporaryDirectory() as tmp, \
+            StandInServer(fixtures, latency=args.latency / 1000) as server, \
+            contextlib.ExitStack() as stack:
+        tmp = Path(tmp)
+        stack.enter_context(patched(
+            generate_post,
+            POSTS_DIR=tmp / "_posts",
+            CACHE_DIR=tmp,
+            post_index=None,
+            trend_store=None,
+            run_state=None,
+            SITE_MANIFEST=tmp / "_manifest.json",
+            site_manifest=None,
+            image_cache=None,
+            wiki_store=None,
+            CUSTOM_SEARCH_URL=server.search_url,
+            WIKIPEDIA_API_URL=server.wikipedia_api_url,
+            PTRENDS_AVAILABLE=True
+        ))
+        if recorded:
+            # Recorded articles were already analyzed when they were fetched
+            stack.enter_context(Replay(generate_post, REPLAY, fixtures, ["get_wikipedia_info"]))
+        else:
+            stack.enter_context(patched(
+                generate_post,
+                WIKIPEDIA_AVAILABLE=True,
+                wikipedia=synthetic_wikipedia(places, args.article_sentences),
+                wiki_store=generate_post.WikiStore(
+                    generate_post.ResponseCache(tmp / "wikipedia.sqlite3"),
+                    generate_post.get_revision_id
+                )
+            ))
+        stack.enter_context(quiet())
+
+        with Replay(generate_post, REPLAY, fixtures, ["TrendScorer.fetch_batch"]):
+            start = time.perf_counter()
+            generate_post.refresh_trend_scores(places, limit=None)
+            generate_post.rank_places_by_trend(places)
+            timings["trend sweep"] = time.perf_counter() - start
+
+        start = time.perf_counter()
+        wiki_infos = [generate_post.get_wikipedia_info(p["name"], p.get("location", "")) for p in places]
+        timings["wiki fetch"] = time.perf_counter() - start
+
+        start = time.perf_counter()
+        for place, info in zip(places, wiki_infos):
+            article = {"summary": info["summary"], "content": info["full_text"] if recorded else
+                       generate_post.wikipedia.page(place["name"]).content}
+            generate_post.analyze_article(article, place["name"])
+        timings["extraction"] = time.perf_counter() - start
+
+        # Searches go through the HTTP client to the stand-in server and are
+        # recorded, so rendering below replays them without any requests
+        searches = Fixtures()
+        start = time.perf_counter()
+        with Replay(generate_post, RECORD, searches, ["search_images"]):
+            for place, info in zip(places, wiki_infos):
+                generate_post.fetch_post_images(place, info["keywords"], info["historical_events"])
+        timings["image search"] = time.perf_counter() - start
+        search_mismatches = check_search_results(server, searches)
+
+        start = time.perf_counter()
+        with Replay(generate_post, REPLAY, searches, ["search_images"]):
+            for place, info in zip(places, wiki_infos):
+                generate_post.create_post(place, info)
+        timings["rendering"] = time.perf_counter() - start
+
+    return timings, search_mismatches
+
+
+def check_search_results(server, searches):
+    """
+    Compare the parsed results of the recorded image searches with the items
+    the stand-in server sent. Returns the number of searches that differ.
+    """
+    mismatches = 0
+    for key, images in searches.items("search_images"):
+        call = json.loads(key)
+        params = {"q": call["query"], "num": call["num_results"]}
+        if call["date_restrict"]:
+            params["dateRestrict"] = call["date_restrict"]
+        expected = [
+            {"url": item["link"], "title": item["title"], "thumbnail": item["image"]["thumbnailLink"],
+             "context": item["image"]["contextLink"]}
+            for item in server.search_response(params)["items"]
+        ]
+        mismatches += images != expected
+    return mismatches
+
+
+def bench_pipeline(args):
+    """
+    Time each stage of post generation for N places against recorded fixtures
+    (or synthetic data) and a local stand-in server.
+    Exits with status 1 if a stage is slower than the baseline allows.
+    """
+    places = make_places(args.places)
+    # No pacing against the local server
+    for endpoint in ("trends", "custom_search", "wikipedia"):
+        configure_limiter(endpoint, 1e9, 1e9)
+    fixtures = Fixtures(args.fixtures)
+    recorded = args.fixtures is not None
+    if not recorded:
+        synthetic_trends(fixtures, places)
+
+    best = {}
+    search_mismatches = 0
+    for _ in range(args.repeat):
+        timings, mismatches = run_pipeline(places, fixtures, recorded, args)
+        search_mismatches += mismatches
+        for stage, seconds in timings.items():
+            best[stage] = min(best.get(stage, float("inf")), seconds)
+    unit = calibrate()
+
+    # Throughput in places per second, and relative to the calibration workload
+    results = {stage: len(places) / max(best[stage], 1e-9) for stage in PIPELINE_STAGES}
+    scores = {stage: results[stage] * unit for stage in PIPELINE_STAGES}
+
+    baseline = {}
+    if args.baseline and Path(args.baseline).exists():
+        baseline = json.loads(Path(args.baseline).read_text(encoding="utf-8")).get("scores", {})
+
+    print(f"{len(places)} places, calibration {unit * 1000:.1f}ms")
+    print(f"{'stage':<14} {'time':>10} {'places/s':>10} {'score':>10} {'baseline':>10}")
+    regressions = []
+    for stage in PIPELINE_STAGES:
+        line = f"{stage:<14} {best[stage] * 1000:>8.1f}ms {results[stage]:>10.1f} {scores[stage]:>10.2f}"
+        if stage in baseline:
+            line += f" {baseline[stage]:>10.2f}"
+            if scores[stage] < baseline[stage] * (1 - args.max_regression):
+                regressions.append(stage)
+                line += "  REGRESSION"
+        print(line)
+
+    if args.save_baseline:
+        data = {"places": len(places), "scores": {stage: round(score, 3) for stage, score in scores.items()}}
+        Path(args.save_baseline).write_text(json.dumps(data, indent=2) + "\n", encoding="utf-8")
+        print(f"Baseline saved to {args.save_baseline}")
+
+    parser = "incrementally (ijson)" if http_client.IJSON_AVAILABLE else "as a whole (ijson not installed)"
+    print(f"Image search responses were parsed {parser}")
+    if search_mismatches:
+        print(f"{search_mismatches} image searches differ from the stand-in server's responses")
+        return 1
+    if regressions:
+        print(f"Throughput regressed more than {args.max_regression:.0%}: {', '.join(regressions)}")
+        return 1
+    return 0
+
+
+def import_profile(module):
+    """
+    Import a module in a fresh interpreter with -X importtime.
+    Returns (cumulative seconds, [(self seconds, imported module)], loaded module names).
+    """
+    code = f"import sys, json, {module}; print(json.dumps(sorted(sys.modules)))"
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        cwd=Path(__file__).resolve().parent, capture_output=True, text=True, check=True
+    )
+    total = None
+    imports = []
+    for line in result.stderr.splitlines():
+        match = _IMPORT_TIME_RE.match(line)
+        if not match:
+            continue
+        own, cumulative, indent, name = match.groups()
+        imports.append((int(own) / 1e6, name))
+        if name == module and not indent:
+            total = int(cumulative) / 1e6
+    return total, imports, json.loads(result.stdout)
+
+
+def bench_startup(args):
+    """
+    Measure the cold import time of generate_post.py and check that heavy
+    packages are deferred. Exits with status 1 if the budget is exceeded.
+    """
+    runs = [import_profile("generate_post") for _ in range(args.repeat)]
+    total, imports, loaded = min(runs, key=lambda run: run[0])
+
+    print(f"import generate_post: {total * 1000:.1f}ms (best of {args.repeat}, budget {args.budget_ms:.0f}ms)")
+    print("slowest imports (self time):")
+    for seconds, name in sorted(imports, reverse=True)[:args.top]:
+        print(f"  {seconds * 1000:>7.2f}ms  {name}")
+
+    failed = False
+    eager = sorted({name.split(".")[0] for name in loaded} & set(DEFERRED_MODULES))
+    if eager:
+        print(f"Imported at startup but should be deferred: {', '.join(eager)}")
+        failed = True
+    if total * 1000 > args.budget_ms:
+        print(f"Import time over budget: {total * 1000:.1f}ms > {args.budget_ms:.0f}ms")
+        failed = True
+    return 1 if failed else 0
+
+
+def make_posts(count, seed=0):
+    """
+    Build assembled posts with a varying number of events and images.
+    """
+    rng = random.Random(seed)
+    posts = []
+    for i in range(count):
+        name = f"Place {i}"
+        location = rng.choice(["", "Detroit, Michigan, USA", "Hashima Island, Japan"])
+
+        def image(kind, number):
+            return {"url": f"https://example.com/{i}/{kind}/{number}.jpg", "title": f"{name} {kind} {number}"}
+
+        events = [
+            (" ".join(rng.sample(FILLER_WORDS, 12)).capitalize() + ".",
+             image("event", n) if rng.random() < 0.8 else None)
+            for n in range(rng.randint(0, 5))
+        ]
+        tags = [name, "abandoned places", "current state"] + ([location] if location else [])
+        posts.append({
+            "name": name,
+            "location": location,
+            "description": " ".join(rng.sample(FILLER_WORDS, 20)).capitalize() + ".",
+            "events": events,
+            "images": [image("current", n) for n in range(rng.randint(0, generate_post.IMAGES_PER_POST))],
+            "metadata": {
+                "title": f"The Current State of {name}",
+                "date": f"2024-01-{i % 28 + 1:02d} 09:00:00",
+                "categories": ["Place Exploration"],
+                "tags": tags
+            }
+        })
+    return posts
+
+
+def baseline_render(post):
+    # Previous implementation: += concatenation, one large f-string and frontmatter.dumps
+    import frontmatter
+    name = post["name"]
+    image_markdown = ""
+    if post["images"]:
+        image_markdown = "\n\n## Current State\n\n"
+        for i, img in enumerate(post["images"], 1):
+            image_markdown += f"![{name} image {i}]({img['url']})\n\n"
+            image_markdown += f"*{img['title']}*\n\n"
+
+    historical_events_text = ""
+    if post["events"]:
+        historical_events_text = "\n## Historical Events\n\n"
+        for i, (event_description, event_image) in enumerate(post["events"], 1):
+            historical_events_text += f"### {i}. {event_description}\n\n"
+            if event_image:
+                historical_events_text += f"![{name} historical event {i}]({event_image['url']})\n\n"
+                historical_events_text += f"*{event_image['title']}*\n\n"
+            else:
+                historical_events_text += f"*이미지를 찾을 수 없습니다.*\n\n"
+    else:
+        historical_events_text = "\n## Historical Background\n\n"
+        historical_events_text += f"{name} has a rich history marked by significant events that shaped its current state. "
+        historical_events_text += f"From its founding to its decline, this place has witnessed many historical moments that reflect the changes of time.\n\n"
+
+    location_text = f" ({post['location']})" if post["location"] else ""
+    content = f"""# The Current State of {name}{location_text}
+
+{post["description"]}
+
+{historical_events_text}
+
+{image_markdown}
+
+## Conclusion
+
+We've explored the current state of {name}, a place that was once popular and thriving. While places change with the passage of time, the memories and stories remain.
+"""
+    rendered = frontmatter.Post(content)
+    rendered.metadata = post["metadata"]
+    return frontmatter.dumps(rendered)
+
+
+def bench_render(args):
+    """
+    Render many posts with the previous string building and with the compiled
+    section templates. Exits with status 1 if any post differs between the two
+    or between two renders.
+    """
+    posts = make_posts(args.posts)
+    start = time.perf_counter()
+    expected = [baseline_render(post) for post in posts]
+    base = time.perf_counter() - start
+
+    new = float("inf")
+    for _ in range(args.repeat):
+        start = time.perf_counter()
+        rendered = [render_post(post) for post in posts]
+        new = min(new, time.perf_counter() - start)
+
+    mismatches = [i for i, (a, b) in enumerate(zip(expected, rendered)) if a != b]
+    mismatches += [i for i, post in enumerate(posts) if render_post(post) != rendered[i]]
+    print(f"{'posts':>8} {'baseline':>10} {'templates':>10} {'speedup':>8} {'posts/s':>10}")
+    print(f"{args.posts:>8} {base:>9.2f}s {new:>9.2f}s {base / new:>7.1f}x {args.posts / new:>10.0f}")
+    if mismatches:
+        print(f"{len(mismatches)} posts render differently, first: #{mismatches[0]}")
+        return 1
+    print("All posts are byte-identical to the previous output.")
+    return 0
+
+
+def bench_corpus(args):
+    """
+    Analyze a synthetic corpus with 1..N worker processes and check the rows
+    against the single-article functions. Exits with status 1 on a mismatch.
+    """
+    names = [place['name'] for place in generate_post.PLACES]
+    articles = [
+        {"name": names[i % len(names)], "location": "", "summary": "",
+         "content": make_article(args.article_sentences, names[i % len(names)], seed=i)}
+        for i in range(args.articles)
+    ]
+
+    with tempfile.TemporaryDirectory() as directory:
+        source = Path(directory) / "articles.jsonl"
+        with open(source, "w", encoding="utf-8") as f:
+            for article in articles:
+                f.write(json.dumps(article) + "\n")
+
+        print(f"{args.articles} articles of {args.article_sentences} sentences, {os.cpu_count()} CPUs")
+        print(f"{'workers':>8} {'time':>9} {'articles/s':>11} {'speedup':>8}")
+        single = None
+        for workers in args.workers:
+            output = Path(directory) / f"corpus-{workers}.jsonl"
+            start = time.perf_counter()
+            corpus.write_columns(output, corpus.analyze_corpus(corpus.iter_articles(source), workers, args.chunk_size))
+            elapsed = time.perf_counter() - start
+            single = single or elapsed
+            print(f"{workers:>8} {elapsed:>8.2f}s {args.articles / elapsed:>11.0f} {single / elapsed:>7.2f}x")
+
+        # Every worker count writes the same file
+        outputs = [Path(directory) / f"corpus-{workers}.jsonl" for workers in args.workers]
+        mismatches = sum(1 for path in outputs if path.read_bytes() != output.read_bytes())
+        for article, row in zip(articles, corpus.read_rows(output)):
+            name, content = article["name"], article["content"]
+            events = generate_post.extract_historical_events(content, name)
+            expected = {
+                "place": name,
+                "keywords": generate_post.extract_keywords(article["summary"] + " " + content[:2000]),
+                "events": events,
+                "descriptions": [generate_post.generate_event_description(event, name) for event in events]
+            }
+            if any(row[column] != value for column, value in expected.items()):
+                mismatches += 1
+    if mismatches:
+        print(f"{mismatches} articles differ from the single-article functions")
+        return 1
+    print("All rows match the single-article functions.")
+    return 0
+
+
+def make_trend_history(count, days, seed=0):
+    """
+    Synthetic daily interest of `count` places over `days` days, with gaps,
+    as (keyword, day, relative interest) rows, and the days since each place
+    was posted (None: never).
+    """
+    rng = random.Random(seed)
+    rows = []
+    for i in range(count):
+        base, trend = rng.uniform(0.05, 3), rng.uniform(-0.02, 0.02)
+        for day in range(days):
+            if rng.random() < 0.7:
+                rows.append((f"Place {i}", day, max(0.0, base + trend * day + rng.gauss(0, 0.1))))
+    posted = [rng.choice([None, rng.randint(0, 365)]) for _ in range(count)]
+    return rows, posted
+
+
+def baseline_trend_features(rows, keywords, end_day, days, posted):
+    # Per-place loop over each place's history, as a plain Python implementation would
+    start = end_day - days + 1
+    history = {keyword: {} for keyword in keywords}
+    for keyword, day, relative in rows:
+        if keyword in history and start <= day <= end_day:
+            history[keyword][day - start] = relative
+
+    def mean(values):
+        return sum(values) / len(values) if values else float("nan")
+
+    features = []
+    for keyword, elapsed in zip(keywords, posted):
+        novelty = 1.0 if elapsed is None else 1 - math.exp(-elapsed / trend_analytics.NOVELTY_DAYS)
+        points = sorted(history[keyword].items())
+        if not points:
+            features.append([float("nan")] * 4 + [novelty])
+            continue
+        weights = [0.5 ** ((days - 1 - x) / trend_analytics.HALF_LIFE_DAYS) for x, _ in points]
+        level = sum(w * y for w, (_, y) in zip(weights, points)) / sum(weights)
+        short = days - trend_analytics.MOMENTUM_DAYS
+        recent = mean([y for x, y in points if x >= short])
+        before = mean([y for x, y in points if x < short])
+        momentum = (recent - before) / (recent + before) if recent + before else float("nan")
+        x_mean = mean([x for x, _ in points])
+        y_mean = mean([y for _, y in points])
+        variance = sum((x - x_mean) ** 2 for x, _ in points)
+        slope = sum((x - x_mean) * (y - y_mean) for x, y in points) / variance if variance else float("nan")
+        features.append([points[-1][1], level, momentum, slope, novelty])
+    return features
+
+
+def bench_trends(args):
+    """
+    Compute the ranking features of many places with a per-place loop and with
+    the interest matrix. Exits with status 1 if the features differ.
+    """
+    import numpy
+
+    rows, posted = make_trend_history(args.places, args.days)
+    keywords = [f"Place {i}" for i in range(args.places)]
+    end_day = args.days - 1
+    elapsed = numpy.array([numpy.nan if days is None else days for days in posted])
+
+    def vectorized():
+        matrix = trend_analytics.interest_matrix(rows, keywords, end_day, args.days)
+        features = trend_analytics.trend_features(matrix, keywords, elapsed)
+        return features, trend_analytics.rank_scores(features, args.ranking)
+
+    expected = baseline_trend_features(rows, keywords, end_day, args.days, posted)
+    base = timed(baseline_trend_features, rows, keywords, end_day, args.days, posted, repeat=args.repeat)
+    new = timed(vectorized, repeat=args.repeat)
+    features, _ = vectorized()
+    matrix = trend_analytics.interest_matrix(rows, keywords, end_day, args.days)
+    features_only = timed(trend_analytics.trend_features, matrix, keywords, elapsed, repeat=args.repeat)
+
+    print(f"{len(rows)} points of {args.places} places over {args.days} days, ranking {args.ranking!r}")
+    print(f"{'places':>8} {'baseline':>10} {'matrix':>10} {'features':>10} {'speedup':>8}")
+    print(f"{args.places:>8} {base * 1000:>8.1f}ms {new * 1000:>8.1f}ms {features_only * 1000:>8.1f}ms "
+          f"{base / new:>7.1f}x")
+    ok = numpy.allclose(numpy.array(expected), features[list(trend_analytics.FEATURES)].to_numpy(),
+                        equal_nan=True)
+    if not ok:
+        print("Features differ from the per-place loop")
+        return 1
+    print("All features match the per-place loop.")
+    return 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmarks for generate_post.py")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    matcher = subparsers.add_parser("matcher", help="keyword matching and event extraction microbenchmark")
+    matcher.add_argument("--sizes", type=int, nargs="+", default=[100, 1000, 10000],
+                         help="article sizes in sentences")
+    matcher.add_argument("--repeat", type=int, default=5)
+    matcher.set_defaults(func=bench_matcher)
+
+    pipeline = subparsers.add_parser("pipeline", help="per-stage throughput of post generation")
+    pipeline.add_argument("--places", type=int, default=12, help="number of places")
+    pipeline.add_argument("--fixtures", help="directory of recorded fixtures (default: synthetic data)")
+    pipeline.add_argument("--article-sentences", type=int, default=2000,
+                          help="sentences per synthetic article")
+    pipeline.add_argument("--latency", type=float, default=0.0,
+                          help="stand-in server latency per request, in milliseconds")
+    pipeline.add_argument("--repeat", type=int, default=3)
+    pipeline.add_argument("--baseline", help="fail if a stage is slower than this baseline file")
+    pipeline.add_argument("--max-regression", type=float, default=0.3,
+                          help="allowed throughput drop relative to the baseline")
+    pipeline.add_argument("--save-baseline", metavar="FILE", help="write the scores to a baseline file")
+    pipeline.set_defaults(func=bench_pipeline)
+
+    startup = subparsers.add_parser("startup", help="cold import time of generate_post.py")
+    startup.add_argument("--budget-ms", type=float, default=100.0, help="maximum import time")
+    startup.add_argument("--repeat", type=int, default=5)
+    startup.add_argument("--top", type=int, default=10, help="number of slowest imports to list")
+    startup.set_defaults(func=bench_startup)
+
+    render = subparsers.add_parser("render", help="batch rendering of assembled posts")
+    render.add_argument("--posts", type=int, default=10000, help="number of posts")
+    render.add_argument("--repeat", type=int, default=3)
+    render.set_defaults(func=bench_render)
+
+    corpus_parser = subparsers.add_parser("corpus", help="parallel corpus analysis")
+    corpus_parser.add_argument("--articles", type=int, default=2000, help="number of articles")
+    corpus_parser.add_argument("--article-sentences", type=int, default=200, help="sentences per article")
+    corpus_parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4],
+                               help="worker process counts to compare")
+    corpus_parser.add_argument("--chunk-size", type=int, default=corpus.CHUNK_SIZE)
+    corpus_parser.set_defaults(func=bench_corpus)
+
+    trends = subparsers.add_parser("trends", help="vectorized trend ranking features")
+    trends.add_argument("--places", type=int, default=5000, help="number of places")
+    trends.add_argument("--days", type=int, default=trend_analytics.WINDOW_DAYS, help="days of history")
+    trends.add_argument("--ranking", default="blend", choices=sorted(trend_analytics.RANKERS))
+    trends.add_argument("--repeat", type=int, default=3)
+    trends.set_defaults(func=bench_trends)
+
+    args = parser.parse_args(argv)
+    return args.func(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
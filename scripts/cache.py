@@ -0,0 +1,146 @@
+"""
+Persistent response cache backed by a single SQLite file.
+Entries are keyed by a hash of the normalized request parameters and expire
+after a TTL; the least recently used entries are evicted above a size cap.
+
+The other files the scripts keep (indexes, manifests, checkpoints, fixtures)
+are written with write_atomic and write_json.
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from pathlib import Path
+
+
+def make_key(params, exclude=("key",)):
+    """
+    Build a content-addressed cache key from request parameters.
+    Parameters listed in `exclude` (such as the API key) are ignored.
+    """
+    normalized = {
+        str(k): str(v).strip() for k, v in params.items()
+        if k not in exclude and v is not None
+    }
+    if "q" in normalized:
+        normalized["q"] = " ".join(normalized["q"].lower().split())
+    payload = json.dumps(normalized, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def write_atomic(path, data):
+    """
+    Write bytes or text (as UTF-8) to a file, creating its directory.
+    The data goes to a temporary file that then replaces the target, so an
+    interrupted run never leaves a partly written file behind.
+    """
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    if isinstance(data, str):
+        data = data.encode("utf-8")
+    tmp_path = path.with_suffix(".tmp")
+    tmp_path.write_bytes(data)
+    os.replace(tmp_path, path)
+
+
+def write_json(path, value, **kwargs):
+    """
+    Write a value as JSON (non-ASCII characters kept) with write_atomic.
+    Keyword arguments are passed to json.dumps.
+    """
+    write_atomic(path, json.dumps(value, ensure_ascii=False, **kwargs))
+
+
+class ResponseCache:
+    """
+    SQLite-backed cache with per-entry TTL, LRU eviction and hit/miss counters.
+    """
+
+    def __init__(self, path, ttl=7 * 24 * 3600, max_bytes=20 * 1024 * 1024):
+        self.path = Path(path)
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._conn = None
+
+    def _connect(self):
+        if self._conn is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self._conn = sqlite3.connect(str(self.path), check_same_thread=False)
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS entries ("
+                " key TEXT PRIMARY KEY,"
+                " value TEXT NOT NULL,"
+                " size INTEGER NOT NULL,"
+                " expires REAL NOT NULL,"
+                " accessed REAL NOT NULL)"
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS entries_accessed ON entries (accessed)")
+            self._conn.commit()
+        return self._conn
+
+    def get(self, key):
+        """
+        Return the cached value for a key, or None if missing or expired.
+        """
+        now = time.time()
+        with self._lock:
+            conn = self._connect()
+            row = conn.execute("SELECT value, expires FROM entries WHERE key = ?", (key,)).fetchone()
+            if row is None or row[1] < now:
+                if row is not None:
+                    conn.execute("DELETE FROM entries WHERE key = ?", (key,))
+                    conn.commit()
+                self.misses += 1
+                return None
+            conn.execute("UPDATE entries SET accessed = ? WHERE key = ?", (now, key))
+            conn.commit()
+            self.hits += 1
+        return json.loads(row[0])
+
+    def set(self, key, value, ttl=None):
+        """
+        Store a JSON-serializable value, evicting old entries if over the size cap.
+        """
+        data = json.dumps(value, ensure_ascii=False)
+        now = time.time()
+        expires = now + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            conn = self._connect()
+            conn.execute(
+                "INSERT OR REPLACE INTO entries (key, value, size, expires, accessed) VALUES (?, ?, ?, ?, ?)",
+                (key, data, len(data.encode("utf-8")), expires, now)
+            )
+            self._evict(conn, now)
+            conn.commit()
+
+    def _evict(self, conn, now):
+        conn.execute("DELETE FROM entries WHERE expires < ?", (now,))
+        total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        # Drop least recently used entries until under the cap
+        for key, size in conn.execute("SELECT key, size FROM entries ORDER BY accessed").fetchall():
+            conn.execute("DELETE FROM entries WHERE key = ?", (key,))
+            total -= size
+            if total <= self.max_bytes:
+                break
+
+    def stats(self):
+        """
+        Returns a dictionary with hit/miss counters and the current entry count.
+        """
+        with self._lock:
+            entries = self._connect().execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+        return {"hits": self.hits, "misses": self.misses, "entries": entries}
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
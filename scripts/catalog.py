@@ -0,0 +1,242 @@
+"""
+Place catalog for the post generation script.
+Places are read from YAML, JSON, JSONL or CSV files into compact records and
+indexed by slug and region on first use. Large JSONL and CSV catalogs are
+streamed from disk instead of being loaded into memory.
+"""
+
+import csv
+import heapq
+import json
+import random
+import re
+from pathlib import Path
+
+from lazy import LazyModule
+
+yaml = LazyModule("yaml")
+
+# JSONL and CSV files above this size are streamed
+STREAM_BYTES = 50 * 1024 * 1024
+
+_STREAMABLE = {".jsonl", ".ndjson", ".csv"}
+
+
+def make_slug(name):
+    """
+    Convert a place name to a URL-safe slug.
+    """
+    slug = re.sub(r'[^\w\s-]', '', name)
+    slug = re.sub(r'[-\s]+', '-', slug)
+    return slug.lower()
+
+
+def region_of(location):
+    """
+    The region of a location: its last comma-separated part ("Michigan, USA" -> "USA").
+    """
+    return location.rsplit(",", 1)[-1].strip()
+
+
+class Place:
+    """
+    One place of the catalog.
+    Supports place['name'] and place.get('location', '') like the dictionaries
+    it replaces.
+    """
+
+    __slots__ = ("name", "location", "description", "region")
+
+    def __init__(self, name, location="", description="", region=""):
+        self.name = name
+        self.location = location
+        self.description = description
+        self.region = region or region_of(location)
+
+    @classmethod
+    def from_record(cls, record):
+        """
+        Build a place from a dictionary; unknown fields are ignored.
+        Raises ValueError if the record has no name.
+        """
+        if not isinstance(record, dict):
+            raise ValueError("place record is not a mapping")
+        name = str(record.get("name") or "").strip()
+        if not name:
+            raise ValueError("place record has no name")
+        return cls(
+            name,
+            str(record.get("location") or "").strip(),
+            str(record.get("description") or "").strip(),
+            str(record.get("region") or "").strip()
+        )
+
+    @property
+    def slug(self):
+        return make_slug(self.name)
+
+    def __getitem__(self, key):
+        if key not in self.__slots__:
+            raise KeyError(key)
+        return getattr(self, key)
+
+    def get(self, key, default=None):
+        if key not in self.__slots__:
+            return default
+        return getattr(self, key)
+
+    def to_dict(self):
+        return {field: getattr(self, field) for field in self.__slots__}
+
+    def __repr__(self):
+        return f"Place({self.name!r}, {self.location!r})"
+
+
+def _iter_records(path):
+    suffix = path.suffix.lower()
+    if suffix in (".jsonl", ".ndjson"):
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+    elif suffix == ".csv":
+        with open(path, encoding="utf-8", newline="") as f:
+            yield from csv.DictReader(f)
+    else:
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f) if suffix == ".json" else yaml.safe_load(f)
+        if isinstance(data, dict):
+            data = data.get("places") or []
+        yield from data
+
+
+def iter_places(source):
+    """
+    Yield the places of a catalog file (YAML, JSON, JSONL or CSV), or of a list
+    of dictionaries. Records without a name are reported and skipped.
+    """
+    records = _iter_records(Path(source)) if isinstance(source, (str, Path)) else source
+    for i, record in enumerate(records, 1):
+        try:
+            yield Place.from_record(record)
+        except ValueError as e:
+            print(f"⚠️  Skipping place {i}: {e}")
+
+
+class _BaseCatalog:
+    # Lookups that only need one pass over the places
+
+    def first(self):
+        """
+        Returns the first place, or None if the catalog is empty.
+        """
+        return next(iter(self), None)
+
+    def find(self, name):
+        """
+        Returns the place with this name or slug (case-insensitive), or None.
+        """
+        key = name.strip().lower()
+        slug = make_slug(key)
+        for place in self:
+            if place.name.lower() == key or place.slug == slug:
+                return place
+        return None
+
+    def in_region(self, region):
+        """
+        Returns the places of a region (case-insensitive), in catalog order.
+        """
+        key = region.strip().lower()
+        return [place for place in self if place.region.lower() == key]
+
+    def sample(self, k, seed=None):
+        """
+        Returns up to `k` places chosen uniformly at random in a single pass,
+        in catalog order. The whole catalog is returned if it has at most `k` places.
+        """
+        rng = random.Random(seed)
+        # Reservoir sampling: keep the k places with the largest random keys
+        heap = []
+        for i, place in enumerate(self):
+            entry = (rng.random(), i, place)
+            if len(heap) < k:
+                heapq.heappush(heap, entry)
+            elif entry[0] > heap[0][0]:
+                heapq.heapreplace(heap, entry)
+        return [place for _, _, place in sorted(heap, key=lambda entry: entry[1])]
+
+
+class Catalog(_BaseCatalog):
+    """
+    Catalog held in memory, with slug and region indexes built on first use.
+    """
+
+    def __init__(self, places):
+        self._places = list(places)
+        self._by_key = None
+        self._by_region = None
+
+    def __iter__(self):
+        return iter(self._places)
+
+    def __len__(self):
+        return len(self._places)
+
+    def __getitem__(self, index):
+        return self._places[index]
+
+    def _build_indexes(self):
+        self._by_key = {}
+        self._by_region = {}
+        for place in self._places:
+            self._by_key.setdefault(place.name.lower(), place)
+            self._by_key.setdefault(place.slug, place)
+            self._by_region.setdefault(place.region.lower(), []).append(place)
+
+    def find(self, name):
+        if self._by_key is None:
+            self._build_indexes()
+        key = name.strip().lower()
+        return self._by_key.get(key) or self._by_key.get(make_slug(key))
+
+    def in_region(self, region):
+        if self._by_region is None:
+            self._build_indexes()
+        return list(self._by_region.get(region.strip().lower(), []))
+
+    def sample(self, k, seed=None):
+        if len(self._places) <= k:
+            return list(self._places)
+        return super().sample(k, seed)
+
+
+class StreamingCatalog(_BaseCatalog):
+    """
+    Catalog read from a JSONL or CSV file on every pass, so only the places
+    in use are kept in memory.
+    """
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self._len = None
+
+    def __iter__(self):
+        return iter_places(self.path)
+
+    def __len__(self):
+        if self._len is None:
+            self._len = sum(1 for _ in self)
+        return self._len
+
+
+def load_catalog(source, stream_bytes=STREAM_BYTES):
+    """
+    Load a catalog from a file or a list of dictionaries.
+    JSONL and CSV files larger than `stream_bytes` are streamed.
+    """
+    if isinstance(source, (str, Path)):
+        path = Path(source)
+        if path.suffix.lower() in _STREAMABLE and path.stat().st_size > stream_bytes:
+            return StreamingCatalog(path)
+    return Catalog(iter_places(source))
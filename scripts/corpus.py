@@ -0,0 +1,204 @@
+#!/usr/bin/env python3
+"""
+Offline analysis of a corpus of article texts.
+Runs the keyword and event extraction of generate_post.py over many articles
+(for example the Wikipedia pages of the whole catalog and pages they link to)
+in a process pool, and streams the results to a columnar file so strong
+candidates can be chosen without API calls.
+
+    python scripts/corpus.py articles.jsonl -o corpus.jsonl.gz --workers 4
+
+Input is a JSONL file or a directory of .json and .txt files. Records have a
+`name` (or `place`), optional `location` and `summary`, and the article text
+in `content` (or `text`); a .txt file is the text of the place named by its
+file name. Several records may belong to one place.
+
+The output has one JSON line per chunk of articles, holding a list per column
+(place, location, keywords, events, descriptions, event_scores, score), in
+input order. Paths ending in .gz are compressed.
+"""
+
+import argparse
+import collections
+import gzip
+import itertools
+import json
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+import generate_post  # noqa: E402
+
+COLUMNS = ("place", "location", "keywords", "events", "descriptions", "event_scores", "score")
+
+# Articles sent to a worker at once
+CHUNK_SIZE = 32
+
+
+def _open(path, mode):
+    path = str(path)
+    if path.endswith(".gz"):
+        return gzip.open(path, mode + "t", encoding="utf-8")
+    return open(path, mode, encoding="utf-8")
+
+
+def _record(data, source):
+    name = str(data.get("name") or data.get("place") or "").strip()
+    if not name:
+        raise ValueError(f"{source}: record has no name")
+    return {
+        "name": name,
+        "location": str(data.get("location") or ""),
+        "summary": str(data.get("summary") or ""),
+        "content": str(data.get("content") or data.get("text") or "")
+    }
+
+
+def iter_articles(source):
+    """
+    Yield the article records of a JSONL file or a directory, in a stable order.
+    Records without a name are reported and skipped.
+    """
+    source = Path(source)
+    if source.is_dir():
+        for path in sorted(source.iterdir()):
+            try:
+                if path.suffix == ".txt":
+                    name = path.stem.replace("_", " ").replace("-", " ")
+                    yield _record({"name": name, "content": path.read_text(encoding="utf-8")}, path.name)
+                elif path.suffix == ".json":
+                    yield _record(json.loads(path.read_text(encoding="utf-8")), path.name)
+            except ValueError as e:
+                print(f"⚠️  Skipping {e}")
+        return
+
+    with _open(source, "r") as f:
+        for number, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            try:
+                yield _record(json.loads(line), f"line {number}")
+            except ValueError as e:
+                print(f"⚠️  Skipping {e}")
+
+
+def analyze(article):
+    """
+    Analyze one article like generate_post.analyze_article, keeping the event
+    scores. Returns a row with one value per column.
+    """
+    name = article["name"]
+    content = article["content"]
+    keywords = generate_post.extract_keywords(article["summary"] + " " + content[:2000])
+    scored = generate_post.extract_historical_events(content, name, with_scores=True)
+    events = [sentence for sentence, _ in scored]
+    scores = [score for _, score in scored]
+    return (
+        name,
+        article["location"],
+        keywords,
+        events,
+        [generate_post.generate_event_description(event, name) for event in events],
+        scores,
+        sum(scores)
+    )
+
+
+def analyze_chunk(articles):
+    """
+    Analyze a chunk of articles in a worker process.
+    Returns the chunk's columns: {column: [value per article]}.
+    """
+    rows = [analyze(article) for article in articles]
+    return {column: [row[i] for row in rows] for i, column in enumerate(COLUMNS)}
+
+
+def chunked(iterable, size):
+    iterator = iter(iterable)
+    while True:
+        chunk = list(itertools.islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def analyze_corpus(articles, workers=None, chunk_size=CHUNK_SIZE):
+    """
+    Yield the columns of each chunk of articles, in input order.
+    At most two chunks per worker are in flight, so memory use doesn't grow
+    with the corpus. With workers=0 the chunks are analyzed in this process.
+    """
+    chunks = chunked(articles, chunk_size)
+    if workers == 0:
+        yield from map(analyze_chunk, chunks)
+        return
+
+    workers = workers or os.cpu_count() or 1
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        pending = collections.deque()
+        for chunk in chunks:
+            pending.append(executor.submit(analyze_chunk, chunk))
+            if len(pending) >= 2 * workers:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+
+def write_columns(path, column_chunks):
+    """
+    Write chunks of columns as JSON lines. Returns the number of rows written.
+    """
+    rows = 0
+    with _open(path, "w") as f:
+        for columns in column_chunks:
+            f.write(json.dumps(columns, ensure_ascii=False, separators=(",", ":")) + "\n")
+            rows += len(columns["place"])
+    return rows
+
+
+def read_rows(path):
+    """
+    Yield the rows of a corpus output file as dictionaries.
+    """
+    with _open(path, "r") as f:
+        for line in f:
+            if line.strip():
+                columns = json.loads(line)
+                for values in zip(*(columns[column] for column in COLUMNS)):
+                    yield dict(zip(COLUMNS, values))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Analyze a corpus of article texts in parallel.")
+    parser.add_argument("source", help="JSONL file or directory of .json/.txt articles")
+    parser.add_argument("-o", "--output", required=True, help="output file (.jsonl, or .jsonl.gz to compress)")
+    parser.add_argument("--workers", type=int, help="worker processes (default: CPU count; 0: no pool)")
+    parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE, help="articles per worker task")
+    parser.add_argument("--top", type=int, default=10, help="number of strongest places to list")
+    args = parser.parse_args(argv)
+
+    # Keep only (score, place) per article for the summary
+    scores = []
+
+    def tracked(column_chunks):
+        for columns in column_chunks:
+            scores.extend(zip(columns["score"], columns["place"]))
+            yield columns
+
+    articles = iter_articles(args.source)
+    rows = write_columns(args.output, tracked(analyze_corpus(articles, args.workers, args.chunk_size)))
+    print(f"Analyzed {rows} articles into {args.output}")
+
+    best = collections.defaultdict(float)
+    for score, place in scores:
+        best[place] = max(best[place], score)
+    for place, score in sorted(best.items(), key=lambda item: -item[1])[:args.top]:
+        print(f"  {place}: {score:.1f}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
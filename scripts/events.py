@@ -0,0 +1,102 @@
+"""
+Relevance ranking for historical event sentences.
+Keeps the best k sentences of a stream in a bounded heap and drops
+near-duplicate sentences, so ranking stays linear in the article length.
+"""
+
+import heapq
+import re
+import zlib
+
+YEAR_RE = re.compile(r"\b(?:1[0-9]|20)\d{2}\b")
+_WORD_RE = re.compile(r"\w+")
+
+
+def shingle_hashes(text, size=3):
+    """
+    Returns the set of hashed word shingles (runs of `size` words) of a text.
+    """
+    words = _WORD_RE.findall(text.lower())
+    if len(words) < size:
+        return {zlib.crc32(" ".join(words).encode("utf-8"))}
+    return {
+        zlib.crc32(" ".join(words[i:i + size]).encode("utf-8"))
+        for i in range(len(words) - size + 1)
+    }
+
+
+def similarity(a, b):
+    """
+    Overlap of two shingle sets, relative to the smaller one.
+    A sentence that repeats most of another (even with extra words) scores high.
+    """
+    if not a or not b:
+        return 0.0
+    return len(a & b) / min(len(a), len(b))
+
+
+def score_event(keywords, sentence, section, keyword_weights, section_weights):
+    """
+    Score a candidate event sentence.
+    Each distinct keyword adds its weight, a year adds 1, and the section
+    the sentence appears in adds its weight (matched by word in the title).
+    """
+    score = sum(keyword_weights.get(keyword, 1.0) for keyword in keywords)
+    if YEAR_RE.search(sentence):
+        score += 1.0
+    for word, weight in section_weights.items():
+        if word in section:
+            score += weight
+            break
+    return score
+
+
+class TopEvents:
+    """
+    Bounded top-k selection of sentences by score.
+    A sentence whose shingles are too similar to a kept sentence only replaces
+    it if it scores higher. Ties keep the earlier sentence.
+    """
+
+    def __init__(self, k=5, max_similarity=0.6):
+        self.k = k
+        self.max_similarity = max_similarity
+        # Min-heap of (score, -position, sentence, shingles); the root is the weakest
+        self._heap = []
+
+    def offer(self, score, position, sentence):
+        """
+        Consider a sentence found at `position` (its index in the text).
+        """
+        full = self.k is not None and len(self._heap) >= self.k
+        if full and (score, -position) <= self._heap[0][:2]:
+            # Weaker than every kept sentence, so it can't replace one
+            return
+
+        entry = (score, -position, sentence, shingle_hashes(sentence))
+
+        for i, kept in enumerate(self._heap):
+            if similarity(entry[3], kept[3]) >= self.max_similarity:
+                if entry[:2] <= kept[:2]:
+                    return
+                # Replace the weaker near-duplicate
+                self._heap[i] = entry
+                heapq.heapify(self._heap)
+                return
+
+        if full:
+            heapq.heapreplace(self._heap, entry)
+        else:
+            heapq.heappush(self._heap, entry)
+
+    def results(self):
+        """
+        Returns the kept sentences in the order they appear in the text.
+        """
+        return [sentence for sentence, _ in self.scored_results()]
+
+    def scored_results(self):
+        """
+        Returns (sentence, score) of the kept sentences in the order they appear in the text.
+        """
+        return [(entry[2], entry[0]) for entry in sorted(self._heap, key=lambda entry: -entry[1])]
@@ -5,29 +5,53 @@ Uses Google Custom Search API to search for images and generate blog posts.
 """
 
 import os
+import argparse
 import json
 import re
+import sys
 import time
-import requests
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
 from pathlib import Path
-import yaml
-import frontmatter
+from urllib.parse import urlsplit
+
+from cache import ResponseCache, make_key
+from catalog import Catalog, load_catalog, make_slug
+from events import TopEvents, score_event
+from http_client import ResponseTooLargeError, configure_host, fetch, iter_body, parse_records, read_body
+from image_index import ImageIndex, average_hash
+from image_mirror import ImageMirror
+from lazy import LazyModule, module_available
+from matcher import KeywordMatcher
+import metrics
+from post_index import PostIndex
+from query_planner import distribute, plan_searches, quota_saved
+from ratelimit import CircuitOpenError, configure_limiter, get_limiter
+from render import render_post
+from run_state import RunState
+from sentences import iter_section_sentences
+from site_manifest import MANIFEST_NAME, SiteManifest
+import trend_analytics
+from trend_store import TrendStore, display_score
+from trends import MAX_KEYWORDS_PER_PAYLOAD, TrendScorer, build_keyword
+from wiki_store import WikiStore
+
+# Packages are imported when first used, so paths that don't need them start fast
+# (pytrends alone pulls in pandas)
+requests = LazyModule("requests")
+yaml = LazyModule("yaml")
 
 # Optional imports with fallback
-try:
-    from pytrends.request import TrendReq
-    PTRENDS_AVAILABLE = True
-except ImportError:
-    PTRENDS_AVAILABLE = False
+PTRENDS_AVAILABLE = module_available("pytrends")
+if PTRENDS_AVAILABLE:
+    pytrends_request = LazyModule("pytrends.request")
+else:
     print("Warning: pytrends not available. Trend-based selection disabled.")
 
-try:
-    import wikipedia
-    wikipedia.set_lang("en")  # Set to English
-    WIKIPEDIA_AVAILABLE = True
-except ImportError:
-    WIKIPEDIA_AVAILABLE = False
+WIKIPEDIA_AVAILABLE = module_available("wikipedia")
+if WIKIPEDIA_AVAILABLE:
+    wikipedia = LazyModule("wikipedia", setup=lambda module: module.set_lang("en"))  # Set to English
+else:
     print("Warning: wikipedia not available. Wikipedia integration disabled.")
 
 # Configuration
@@ -37,16 +61,220 @@ GOOGLE_API_KEY = os.getenv("GOOGLE_API_KEY", "AIzaSyBUrWy_QcqzNFbRPik7Dm7MqXmIbq
 # Available at https://programmablesearchengine.google.com/
 # Your CSE ID: 8690747c4ec274a1e
 CUSTOM_SEARCH_ENGINE_ID = os.getenv("GOOGLE_CSE_ID", "8690747c4ec274a1e")
+CUSTOM_SEARCH_URL = os.getenv("CUSTOM_SEARCH_URL", "https://www.googleapis.com/customsearch/v1")
 
 POSTS_DIR = Path("_posts")
-IMAGES_DIR = Path("images")
+IMAGES_DIR = Path(os.getenv("IMAGES_DIR", "images"))
 
-# Initialize pytrends (if available)
-if PTRENDS_AVAILABLE:
-    pytrends = TrendReq(hl='en-US', tz=360)
+# Optional settings file (see config.example.yaml)
+CONFIG_FILE = Path(os.getenv("CONFIG_FILE", "scripts/config.yaml"))
+
+
+def load_config(path):
+    """
+    Read the YAML settings file. Returns {} if it doesn't exist.
+    """
+    try:
+        with open(path, encoding="utf-8") as f:
+            return yaml.safe_load(f) or {}
+    except FileNotFoundError:
+        return {}
+
+
+config = load_config(CONFIG_FILE)
+posting_config = config.get("posting") or {}
+
+# Current state images per post (a search returns at most CURRENT_IMAGE_CANDIDATES)
+IMAGES_PER_POST = int(posting_config.get("images_per_post", 5))
+
+# Place catalog file (YAML, JSON, JSONL or CSV); defaults to the config file's
+# `places` (a list or a file path) or the built-in list below
+PLACES_FILE = os.getenv("PLACES_FILE", "")
+# Large catalogs: how many randomly sampled places are considered per run
+SELECTION_SAMPLE_SIZE = int(os.getenv("SELECTION_SAMPLE_SIZE", "50"))
+
+# Retries of rate limited, timed out and failed API requests, and how many failures
+# in a row pause an API for API_COOLDOWN seconds
+API_MAX_RETRIES = int(os.getenv("API_MAX_RETRIES", "3"))
+API_FAILURE_THRESHOLD = int(os.getenv("API_FAILURE_THRESHOLD", "5"))
+API_COOLDOWN = float(os.getenv("API_COOLDOWN", "60"))
+_retry_settings = {
+    "max_retries": API_MAX_RETRIES,
+    "failure_threshold": API_FAILURE_THRESHOLD,
+    "cooldown": API_COOLDOWN
+}
+
+# Google Trends scoring: parallel batches and request rate (requests per second)
+TRENDS_WORKERS = int(os.getenv("TRENDS_WORKERS", "2"))
+TRENDS_QPS = float(os.getenv("TRENDS_QPS", "0.5"))
+configure_limiter("trends", TRENDS_QPS, **_retry_settings)
+# Term included in every Trends batch to compare scores across batches and runs
+# (defaults to the first place in the list)
+TRENDS_ANCHOR = os.getenv("TRENDS_ANCHOR", "")
+# Trend scores are stored with the time they were fetched (loaded on first use);
+# each run refreshes at most TRENDS_REFRESH_PER_RUN places whose score is older
+# than TRENDS_MAX_AGE_DAYS, oldest first
+trend_store = None
+TRENDS_REFRESH_PER_RUN = int(os.getenv("TRENDS_REFRESH_PER_RUN", "8"))
+TRENDS_MAX_AGE_DAYS = float(os.getenv("TRENDS_MAX_AGE_DAYS", "7"))
+# Ranking of places by their stored trend history (see trend_analytics.RANKERS):
+# "latest" ranks by the last score only; the others use the daily interest of
+# the last TREND_WINDOW_DAYS days and need pandas
+TREND_RANKING = os.getenv("TREND_RANKING", "latest")
+TREND_WINDOW_DAYS = int(os.getenv("TREND_WINDOW_DAYS", str(trend_analytics.WINDOW_DAYS)))
+PANDAS_AVAILABLE = module_available("pandas")
+
+# Image searches: parallel requests and request rate (requests per second)
+IMAGE_SEARCH_WORKERS = int(os.getenv("IMAGE_SEARCH_WORKERS", "6"))
+IMAGE_SEARCH_QPS = float(os.getenv("IMAGE_SEARCH_QPS", "5"))
+configure_limiter("custom_search", IMAGE_SEARCH_QPS, IMAGE_SEARCH_WORKERS, **_retry_settings)
+# Image thumbnails (only downloaded with IMAGE_PHASH)
+configure_limiter("thumbnail", 10, IMAGE_SEARCH_WORKERS, **_retry_settings)
+
+# Results fetched per search: one query costs the same quota for 1 or 10 results,
+# and the extra results are used instead of images earlier posts already used
+EVENT_IMAGE_CANDIDATES = 5
+CURRENT_IMAGE_CANDIDATES = 10
+# Event queries that share at least this fraction of their words (besides the place
+# and location) are answered by one search for 10 results (above 1 disables merging;
+# duplicates always share a search)
+QUERY_MERGE_THRESHOLD = float(os.getenv("QUERY_MERGE_THRESHOLD", "0.5"))
+# Also compare downloaded thumbnails by perceptual hash (requires Pillow)
+IMAGE_PHASH = os.getenv("IMAGE_PHASH", "0") == "1"
+
+# Download the images of each post into IMAGES_DIR (stored by content hash, with
+# resized WebP copies when Pillow is installed) and link the local copies
+MIRROR_IMAGES = os.getenv("MIRROR_IMAGES", "0") == "1"
+# URL of IMAGES_DIR on the site
+IMAGES_URL = os.getenv("IMAGES_URL", "{{ site.baseurl }}/images")
+MIRROR_WIDTHS = [int(w) for w in os.getenv("MIRROR_WIDTHS", "480,1024").split(",") if w.strip()]
+MIRROR_WORKERS = int(os.getenv("MIRROR_WORKERS", "6"))
+configure_limiter("image_download", 10, MIRROR_WORKERS, **_retry_settings)
+image_mirror = None
+
+# Manifest of the posts and images the generator wrote, with content hashes, for
+# incremental site builds ("" disables it; a post identical to an earlier one
+# is then written anyway)
+SITE_MANIFEST = os.getenv("SITE_MANIFEST", MANIFEST_NAME)
+site_manifest = None
+
+# Local cache for API responses (kept next to _posts/)
+CACHE_DIR = Path(os.getenv("CACHE_DIR", ".cache"))
+IMAGE_CACHE_ENABLED = os.getenv("IMAGE_CACHE", "1") != "0"
+IMAGE_CACHE_TTL_DAYS = float(os.getenv("IMAGE_CACHE_TTL_DAYS", "7"))
+IMAGE_CACHE_MAX_MB = float(os.getenv("IMAGE_CACHE_MAX_MB", "20"))
+
+image_cache = None
+if IMAGE_CACHE_ENABLED:
+    image_cache = ResponseCache(
+        CACHE_DIR / "search_images.sqlite3",
+        ttl=IMAGE_CACHE_TTL_DAYS * 24 * 3600,
+        max_bytes=int(IMAGE_CACHE_MAX_MB * 1024 * 1024)
+    )
+
+# Index of existing posts (loaded on first use) and how many days a place
+# is skipped after it was posted
+post_index = None
+RECENT_POST_DAYS = int(os.getenv("RECENT_POST_DAYS", "14"))
+
+# Wikipedia articles are stored locally and revalidated by revision ID
+WIKIPEDIA_API_URL = os.getenv("WIKIPEDIA_API_URL", "https://en.wikipedia.org/w/api.php")
+WIKIPEDIA_QPS = float(os.getenv("WIKIPEDIA_QPS", "5"))
+configure_limiter("wikipedia", WIKIPEDIA_QPS, 2, **_retry_settings)
+WIKI_CACHE_ENABLED = os.getenv("WIKI_CACHE", "1") != "0"
+WIKI_CACHE_TTL_DAYS = float(os.getenv("WIKI_CACHE_TTL_DAYS", "30"))
+# Bump when keyword or event extraction changes so stored articles are analyzed again
+WIKI_EXTRACTION_VERSION = 7
+
+wiki_store = None
+if WIKI_CACHE_ENABLED:
+    wiki_store = WikiStore(
+        ResponseCache(CACHE_DIR / "wikipedia.sqlite3", ttl=WIKI_CACHE_TTL_DAYS * 24 * 3600, max_bytes=100 * 1024 * 1024),
+        lambda title: get_revision_id(title)
+    )
+
+# Seconds to wait for the Custom Search and Wikipedia APIs and the largest response
+# accepted from them (other hosts: 20 seconds, 20 MB); thumbnails are smaller
+API_TIMEOUT = float(os.getenv("API_TIMEOUT", "10"))
+API_MAX_RESPONSE_KB = int(os.getenv("API_MAX_RESPONSE_KB", "1024"))
+for _api_url in (CUSTOM_SEARCH_URL, WIKIPEDIA_API_URL):
+    configure_host(urlsplit(_api_url).hostname, timeout=(5, API_TIMEOUT), max_bytes=API_MAX_RESPONSE_KB * 1024)
+THUMBNAIL_MAX_BYTES = 2 * 1024 * 1024
+
+# Fields of Custom Search results that are kept (the rest is skipped while parsing)
+SEARCH_RESULT_FIELDS = ("link", "title", "image.thumbnailLink", "image.contextLink")
+
+# Record API responses to fixture files ("record") or answer from them without
+# network calls ("replay")
+REPLAY_MODE = os.getenv("REPLAY_MODE", "")
+REPLAY_DIR = Path(os.getenv("REPLAY_DIR", "scripts/fixtures"))
+
+# Threads (and pooled connections) of the asyncio driver (--async)
+ASYNC_WORKERS = int(os.getenv("ASYNC_WORKERS", "8"))
+
+# Each stage of a post is checkpointed to CACHE_DIR/runs/<date>/ so a failed or
+# interrupted run resumes where it stopped (loaded on first use)
+RUN_STATE_ENABLED = os.getenv("RUN_STATE", "1") != "0"
+run_state = None
+
+# Spans and counters of the run are written to this JSON-lines file (disabled if empty)
+METRICS_FILE = os.getenv("METRICS_FILE", "")
+
+# Keywords that indicate abandoned/ruined places
+CHARACTERISTIC_KEYWORDS = [
+    "abandoned", "ruins", "ruined", "ghost town", "deserted", "derelict",
+    "decay", "decayed", "dilapidated", "crumbling", "collapsed",
+    "mining", "mine", "industrial", "factory", "manufacturing",
+    "disaster", "destroyed", "evacuated", "uninhabited",
+    "preserved", "memorial", "historical", "heritage",
+    "Soviet", "communist", "war", "bombing", "conflict"
+]
+
+# Location-specific terms
+LOCATION_TERMS = ["city", "town", "village", "island", "resort", "hotel", "zoo"]
+
+# Keywords that indicate historical events
+HISTORICAL_KEYWORDS = [
+    "war", "battle", "disaster", "crisis", "revolution", "invasion",
+    "earthquake", "fire", "evacuation", "abandonment", "decline",
+    "collapse", "destruction", "attack", "bombing", "conflict",
+    "epidemic", "pandemic", "strike", "riot", "uprising",
+    "established", "founded", "built", "destroyed", "evacuated",
+    "closed", "abandoned", "declared", "announced"
+]
+
+# How much each historical keyword adds to an event's relevance (default 1.0).
+# Dramatic events and the place's decline matter most; founding and
+# construction are common in every article and matter less.
+HISTORICAL_KEYWORD_WEIGHTS = {
+    "war": 3.0, "battle": 3.0, "disaster": 3.0, "revolution": 2.5, "invasion": 3.0,
+    "earthquake": 3.0, "fire": 2.5, "evacuation": 3.0, "abandonment": 3.0, "decline": 2.5,
+    "collapse": 2.5, "destruction": 3.0, "attack": 2.5, "bombing": 3.0, "conflict": 2.0,
+    "epidemic": 2.5, "pandemic": 2.5, "riot": 2.5, "uprising": 2.5, "crisis": 2.0,
+    "destroyed": 2.5, "evacuated": 3.0, "abandoned": 3.0, "closed": 2.0, "strike": 2.0,
+    "established": 1.0, "founded": 1.0, "built": 1.0, "declared": 1.0, "announced": 0.5
+}
 
-# List of places that were once popular around the world
-PLACES = [
+# Bonus for sentences in article sections whose title contains these words
+EVENT_SECTION_WEIGHTS = {
+    "history": 1.5, "decline": 2.0, "disaster": 2.0, "abandon": 2.0, "war": 1.5,
+    "economy": 0.5
+}
+# Sections that never contain events
+SKIPPED_SECTIONS = ("see also", "references", "notes", "external links", "further reading", "bibliography")
+
+# Important event keywords used in event image queries
+EVENT_IMAGE_TERMS = [
+    "war", "battle", "disaster", "fire", "earthquake",
+    "evacuation", "bombing", "attack", "surrender",
+    "victory", "hiatus", "restriction", "announced"
+]
+
+# Compiled once and shared by all posts
+HISTORICAL_MATCHER = KeywordMatcher(HISTORICAL_KEYWORDS)
+
+# List of places that were once popular around the world (used without a catalog file)
+DEFAULT_PLACES = [
     {"name": "Times Square", "location": "New York, USA", "description": "Times Square was once the vibrant heart of New York City, known for its dazzling lights and bustling crowds."},
     {"name": "Detroit", "location": "Michigan, USA", "description": "Detroit was once the Motor City, a thriving industrial hub and symbol of American manufacturing power."},
     {"name": "Pripyat", "location": "Ukraine", "description": "Pripyat was a modern Soviet city until the Chernobyl disaster, now a ghost town frozen in time."},
@@ -62,43 +290,70 @@ PLACES = [
 ]
 
 
-def get_trend_score(place_name, location=""):
+def load_places():
     """
-    Get Google Trends score for a place.
-    Returns a score from 0-100 based on recent search trends.
+    Load the place catalog from PLACES_FILE, the config file's `places`
+    or DEFAULT_PLACES, in that order.
     """
-    if not PTRENDS_AVAILABLE:
-        return 50  # Default score if pytrends not available
-    
+    source = PLACES_FILE or config.get("places") or DEFAULT_PLACES
+    if isinstance(source, str):
+        # Relative paths in the config file are relative to the config file
+        path = Path(source)
+        if not PLACES_FILE and not path.is_absolute():
+            path = CONFIG_FILE.parent / path
+        source = path
+    return load_catalog(source)
+
+
+PLACES = load_places()
+
+
+def make_trend_client():
+    """
+    Create a pytrends client (this already sends a request to Google).
+    """
+    return pytrends_request.TrendReq(hl='en-US', tz=360)
+
+
+def get_revision_id(title):
+    """
+    Get the current revision ID of a Wikipedia page without downloading it.
+    Returns None if the check fails.
+    """
+    params = {
+        "action": "query",
+        "prop": "info",
+        "titles": title,
+        "redirects": 1,
+        "format": "json"
+    }
     try:
-        # Build search keyword
-        keyword = place_name
-        if location:
-            keyword = f"{place_name} {location}"
-        
-        # Get interest over time for the last 30 days
-        pytrends.build_payload([keyword], cat=0, timeframe='today 1-m', geo='', gprop='')
-        df = pytrends.interest_over_time()
-        
-        if df.empty:
-            return 50  # Default score if no data
-        
-        # Calculate average trend score
-        avg_score = df[keyword].mean()
-        return min(100, max(0, int(avg_score)))
-    
-    except KeyboardInterrupt:
-        # User interrupted - re-raise
-        raise
-    except Exception as e:
-        # Rate limiting or other errors - return default score
-        # Don't print error for rate limiting (429) or network errors to avoid spam
-        error_str = str(e).lower()
-        if "429" not in error_str and "timeout" not in error_str and "interrupt" not in error_str:
-            print(f"  ⚠️  Error getting trend score for {place_name}: {type(e).__name__}")
-        return 50  # Default score on error
+        response = fetch("wikipedia", WIKIPEDIA_API_URL, params=params)
+        response.raise_for_status()
+        pages = response.json().get("query", {}).get("pages", {})
+        for page in pages.values():
+            if "lastrevid" in page:
+                return page["lastrevid"]
+    except (requests.exceptions.RequestException, ValueError, CircuitOpenError, ResponseTooLargeError):
+        pass
+    return None
+
+
+def analyze_article(article, place_name):
+    """
+    Extract keywords and historical events from a stored article.
+    Returns the article dictionary with the extracted fields filled in.
+    """
+    content = article["content"]
+    article["keywords"] = extract_keywords(article["summary"] + " " + content[:2000])
+    # The whole article is scanned; sentences are streamed, so this stays cheap
+    article["historical_events"] = extract_historical_events(content, place_name)
+    article["place_name"] = place_name
+    article["version"] = WIKI_EXTRACTION_VERSION
+    return article
 
 
+@metrics.traced("get_wikipedia_info")
 def get_wikipedia_info(place_name, location=""):
     """
     Get Wikipedia information for a place.
@@ -119,26 +374,52 @@ def get_wikipedia_info(place_name, location=""):
             # Try with location first
             search_query = f"{place_name}, {location}"
         
-        try:
-            page = wikipedia.page(search_query, auto_suggest=True)
-        except wikipedia.exceptions.DisambiguationError as e:
-            # If disambiguation, try first option
-            page = wikipedia.page(e.options[0])
-        except wikipedia.exceptions.PageError:
-            # Try without location
-            page = wikipedia.page(place_name, auto_suggest=True)
+        # Reuse the stored article if its revision hasn't changed
+        article = wiki_store.get(search_query) if wiki_store is not None else None
         
-        # Extract historical events from full content
-        full_content = page.content[:10000]  # First 10000 chars for better historical context
-        historical_events = extract_historical_events(full_content, place_name)
+        if article is None:
+            metrics.count("cache.wikipedia.misses")
+            # The wikipedia package sends its own requests; pace them with the revision checks
+            get_limiter("wikipedia").acquire()
+            metrics.count("api_calls.wikipedia")
+            title = wiki_store.resolve(search_query) if wiki_store is not None else None
+            if title is not None:
+                # The query was resolved before; skip search and disambiguation
+                page = wikipedia.page(title, auto_suggest=False)
+            else:
+                try:
+                    page = wikipedia.page(search_query, auto_suggest=True)
+                except wikipedia.exceptions.DisambiguationError as e:
+                    # If disambiguation, try first option
+                    page = wikipedia.page(e.options[0])
+                except wikipedia.exceptions.PageError:
+                    # Try without location
+                    page = wikipedia.page(place_name, auto_suggest=True)
+            
+            article = {
+                "title": page.title,
+                "url": page.url,
+                "summary": page.summary,
+                "content": page.content,
+                "revision_id": page.revision_id
+            }
+        else:
+            metrics.count("cache.wikipedia.hits")
+        
+        # Extract historical events from full content (again only if extraction changed)
+        stored = article.get("version") == WIKI_EXTRACTION_VERSION and article.get("place_name") == place_name
+        if not stored:
+            analyze_article(article, place_name)
+            if wiki_store is not None:
+                wiki_store.put(search_query, article)
         
         return {
-            "summary": page.summary,
-            "keywords": extract_keywords(page.summary + " " + full_content[:2000]),
-            "full_text": full_content,
-            "url": page.url,
-            "title": page.title,
-            "historical_events": historical_events
+            "summary": article["summary"],
+            "keywords": article["keywords"],
+            "full_text": article["content"][:10000],
+            "url": article["url"],
+            "title": article["title"],
+            "historical_events": article["historical_events"]
         }
     
     except Exception as e:
@@ -155,82 +436,54 @@ def extract_keywords(text):
     """
     Extract relevant keywords from text that describe the place's characteristics.
     """
-    # Keywords that indicate abandoned/ruined places
-    characteristic_keywords = [
-        "abandoned", "ruins", "ruined", "ghost town", "deserted", "derelict",
-        "decay", "decayed", "dilapidated", "crumbling", "collapsed",
-        "mining", "mine", "industrial", "factory", "manufacturing",
-        "disaster", "destroyed", "evacuated", "uninhabited",
-        "preserved", "memorial", "historical", "heritage",
-        "Soviet", "communist", "war", "bombing", "conflict"
-    ]
-    
     text_lower = text.lower()
-    found_keywords = []
     
-    for keyword in characteristic_keywords:
-        if keyword in text_lower:
-            found_keywords.append(keyword)
-    
-    # Also extract location-specific terms
-    location_terms = ["city", "town", "village", "island", "resort", "hotel", "zoo"]
-    for term in location_terms:
-        if term in text_lower:
-            found_keywords.append(term)
-    
-    # Remove duplicates and return top 5
-    return list(set(found_keywords))[:5]
+    # Characteristic keywords first, then location-specific terms; return top 5
+    found_keywords = [k for k in CHARACTERISTIC_KEYWORDS + LOCATION_TERMS if k.lower() in text_lower]
+    return found_keywords[:5]
 
 
-def extract_historical_events(wiki_text, place_name):
+@metrics.traced("extract_historical_events")
+def extract_historical_events(wiki_text, place_name, max_events=5, with_scores=False):
     """
     Extract historical events from Wikipedia text.
-    Returns a list of historical event descriptions.
+    Returns the `max_events` most relevant historical event descriptions
+    (all of them if `max_events` is None), in the order they appear in the text,
+    or (description, relevance score) pairs if `with_scores` is set.
     """
     if not wiki_text:
         return []
     
-    # Keywords that indicate historical events
-    historical_keywords = [
-        "war", "battle", "disaster", "crisis", "revolution", "invasion",
-        "earthquake", "fire", "evacuation", "abandonment", "decline",
-        "collapse", "destruction", "attack", "bombing", "conflict",
-        "epidemic", "pandemic", "strike", "riot", "uprising",
-        "established", "founded", "built", "destroyed", "evacuated",
-        "closed", "abandoned", "declared", "announced"
-    ]
-    
-    # Split text into sentences
-    sentences = re.split(r'[.!?]+', wiki_text)
-    historical_sentences = []
+    place_lower = place_name.lower()
+    top_events = TopEvents(max_events)
     
-    for sentence in sentences:
-        sentence = sentence.strip()
+    # Score every candidate sentence of the article and keep only the best ones
+    for position, (section, sentence) in enumerate(iter_section_sentences(wiki_text)):
         if len(sentence) < 30:  # Skip very short sentences
             continue
+        if section.startswith(SKIPPED_SECTIONS):
+            continue
         
-        sentence_lower = sentence.lower()
-        # Check if sentence contains historical keywords
-        for keyword in historical_keywords:
-            if keyword in sentence_lower:
-                # Check if sentence mentions the place name
-                if place_name.lower() in sentence_lower:
-                    historical_sentences.append(sentence)
-                    break
+        # Check if sentence mentions the place name and contains historical keywords
+        if place_lower not in sentence.lower():
+            continue
+        keywords = {keyword for _, _, keyword in HISTORICAL_MATCHER.finditer(sentence)}
+        if not keywords:
+            continue
         
-        # Limit to top 5 historical events
-        if len(historical_sentences) >= 5:
-            break
+        score = score_event(keywords, sentence, section, HISTORICAL_KEYWORD_WEIGHTS, EVENT_SECTION_WEIGHTS)
+        top_events.offer(score, position, sentence)
     
-    return historical_sentences[:5]
+    return top_events.scored_results() if with_scores else top_events.results()
 
 
+@metrics.traced("search_images")
 def search_images(query, num_results=10, date_restrict=None):
     """
     Search for images using Google Custom Search API.
     If date_restrict is None, searches all time (most relevant).
     """
-    url = "https://www.googleapis.com/customsearch/v1"
+    url = CUSTOM_SEARCH_URL
     
     params = {
         "key": GOOGLE_API_KEY,
@@ -247,28 +500,52 @@ def search_images(query, num_results=10, date_restrict=None):
     if date_restrict:
         params["dateRestrict"] = date_restrict
     
+    # Reuse a cached response for the same query (the API key is not part of the key)
+    cache_key = make_key(params)
+    if image_cache is not None:
+        cached = image_cache.get(cache_key)
+        if cached is not None:
+            metrics.count("cache.search_images.hits")
+            return cached
+        metrics.count("cache.search_images.misses")
+    
     try:
-        response = requests.get(url, params=params, timeout=10)
+        # Stay under the Custom Search rate limit when searches run in parallel;
+        # rate limited and failed requests are retried after a pause
+        response = fetch("custom_search", url, pool_size=IMAGE_SEARCH_WORKERS, params=params, stream=True)
         response.raise_for_status()
-        data = response.json()
+        # Only the fields used are kept while the response is parsed
+        items, top = parse_records(
+            iter_body(response, API_MAX_RESPONSE_KB * 1024), "items", SEARCH_RESULT_FIELDS, ["error.message"]
+        )
         
         # Check for API errors
-        if "error" in data:
-            error_msg = data["error"].get("message", "Unknown error")
-            print(f"Google API Error: {error_msg}")
+        if "error.message" in top:
+            print(f"Google API Error: {top['error.message']}")
             return []
         
         images = []
-        if "items" in data:
-            for item in data["items"]:
-                images.append({
-                    "url": item.get("link", ""),
-                    "title": item.get("title", ""),
-                    "thumbnail": item.get("image", {}).get("thumbnailLink", ""),
-                    "context": item.get("image", {}).get("contextLink", "")
-                })
+        for item in items:
+            images.append({
+                "url": item.get("link", ""),
+                "title": item.get("title", ""),
+                "thumbnail": item.get("image.thumbnailLink", ""),
+                "context": item.get("image.contextLink", "")
+            })
+        
+        if image_cache is not None:
+            image_cache.set(cache_key, images)
         
         return images
+    except CircuitOpenError as e:
+        print(f"Image search skipped: {e}")
+        return []
+    except ResponseTooLargeError as e:
+        print(f"Image search response too large: {e}")
+        return []
+    except ValueError as e:
+        print(f"Invalid image search response: {e}")
+        return []
     except requests.exceptions.Timeout:
         print(f"Image search timeout: {query}")
         return []
@@ -276,43 +553,41 @@ def search_images(query, num_results=10, date_restrict=None):
         print(f"Error occurred during image search: {e}")
         if hasattr(e, 'response') and e.response is not None:
             try:
-                error_data = e.response.json()
+                error_data = json.loads(read_body(e.response, API_MAX_RESPONSE_KB * 1024))
                 print(f"Error details: {error_data}")
             except:
                 print(f"Response status code: {e.response.status_code}")
         return []
 
 
-def search_images_by_features(place_name, location, keywords, num_results=10):
+def build_feature_query(place_name, location, keywords):
     """
-    Search for images using place name and characteristic keywords.
+    Build the image search query for the current state of a place.
     """
     # Build query with keywords
     if keywords:
         keyword_str = " ".join(keywords[:3])  # Use top 3 keywords
-        query = f"{place_name} {location} {keyword_str} current state"
-    else:
-        query = f"{place_name} {location} abandoned current state"
-    
+        return f"{place_name} {location} {keyword_str} current state"
+    return f"{place_name} {location} abandoned current state"
+
+
+def search_images_by_features(place_name, location, keywords, num_results=10):
+    """
+    Search for images using place name and characteristic keywords.
+    """
+    query = build_feature_query(place_name, location, keywords)
     print(f"Searching images with query: {query}")
     return search_images(query, num_results, date_restrict=None)
 
 
-def search_image_for_event(place_name, location, event_text, num_results=1):
+def build_event_query(place_name, location, event_text):
     """
-    Search for an image related to a specific historical event.
-    Returns the most relevant image.
+    Build the image search query for a historical event.
     """
     # Extract key terms from event text
     event_lower = event_text.lower()
     key_terms = []
     
-    # Extract important keywords from the event
-    important_words = ["war", "battle", "disaster", "fire", "earthquake", 
-                      "evacuation", "bombing", "attack", "surrender", 
-                      "victory", "hiatus", "restriction", "announced",
-                      "world war", "wwii", "ww2", "wwi", "ww1"]
-    
     # Check for multi-word phrases first
     if "world war ii" in event_lower or "wwii" in event_lower or "ww2" in event_lower:
         key_terms.append("World War II")
@@ -320,30 +595,42 @@ def search_image_for_event(place_name, location, event_text, num_results=1):
         key_terms.append("World War I")
     
     # Then check for single words
-    for word in important_words:
-        if word in event_lower and word not in ["world war", "wwii", "ww2", "wwi", "ww1"]:
+    for word in EVENT_IMAGE_TERMS:
+        if word in event_lower:
             key_terms.append(word)
     
     # Build query: place name + location + key event terms
     if key_terms:
         # Use place name + key terms for better relevance
-        query = f"{place_name} {location} {' '.join(key_terms[:2])}"
-    else:
-        # Fallback: use place name and extract year if present
-        year_match = re.search(r'\b(19|20)\d{2}\b', event_text)
-        if year_match:
-            query = f"{place_name} {location} {year_match.group()}"
-        else:
-            # Use first few meaningful words
-            event_words = [w for w in event_text.split() if len(w) > 3][:4]
-            query = f"{place_name} {location} {' '.join(event_words)}"
+        return f"{place_name} {location} {' '.join(key_terms[:2])}"
     
-    print(f"  Searching image for event: {event_text[:60]}...")
-    images = search_images(query, num_results, date_restrict=None)
+    # Fallback: use place name and extract year if present
+    year_match = re.search(r'\b(19|20)\d{2}\b', event_text)
+    if year_match:
+        return f"{place_name} {location} {year_match.group()}"
     
-    if images:
-        return images[0]
-    return None
+    # Use first few meaningful words
+    event_words = [w for w in event_text.split() if len(w) > 3][:4]
+    return f"{place_name} {location} {' '.join(event_words)}"
+
+
+def search_event_images(place_name, location, event_text, num_results=EVENT_IMAGE_CANDIDATES):
+    """
+    Search for images related to a specific historical event.
+    Returns the results in order of relevance.
+    """
+    query = build_event_query(place_name, location, event_text)
+    print(f"  Searching image for event: {event_text[:60]}...")
+    return search_images(query, num_results, date_restrict=None)
+
+
+def search_image_for_event(place_name, location, event_text, num_results=EVENT_IMAGE_CANDIDATES):
+    """
+    Search for an image related to a specific historical event.
+    Returns the most relevant image that no earlier post used.
+    """
+    images = search_event_images(place_name, location, event_text, num_results)
+    return pick_unused_image(images, ImageIndex(), {})
 
 
 def generate_event_description(event_text, place_name, max_length=200):
@@ -405,54 +692,283 @@ def generate_event_description(event_text, place_name, max_length=200):
         return event[:max_length - 3] + '...'
 
 
-def create_post(place, wiki_info=None):
+def get_post_index():
     """
-    Generate a blog post based on place information.
+    Return the index of existing posts, loading it on first use.
     """
-    # Get Wikipedia info if not provided
-    if wiki_info is None:
-        print(f"Fetching Wikipedia information for '{place['name']}'...")
-        wiki_info = get_wikipedia_info(place['name'], place.get('location', ''))
-    
-    # Extract keywords for image search
-    keywords = wiki_info.get('keywords', [])
-    if not keywords:
-        keywords = extract_keywords(place.get('description', ''))
+    global post_index
+    if post_index is None:
+        post_index = PostIndex.load(CACHE_DIR / "post_index.json", POSTS_DIR)
+    return post_index
+
+
+def get_run_state():
+    """
+    Returns the checkpoints of today's run (None if RUN_STATE=0), removing
+    those of earlier days on first use.
+    """
+    global run_state
+    if run_state is None and RUN_STATE_ENABLED:
+        run_state = RunState(CACHE_DIR / "runs")
+        run_state.collect_garbage()
+    return run_state
+
+
+def wikipedia_info(place):
+    """
+    Wikipedia information of a place, from today's checkpoint if there is one.
+    """
+    state = get_run_state()
+    if state is not None:
+        wiki_info = state.get(place, "wiki_info")
+        if wiki_info is not None:
+            print(f"Resuming with the Wikipedia information fetched earlier for '{place['name']}'")
+            return wiki_info
+    wiki_info = get_wikipedia_info(place['name'], place.get('location', ''))
+    # Failed lookups (no summary) are tried again on the next run
+    if state is not None and wiki_info.get('summary'):
+        state.put(place, "wiki_info", wiki_info)
+    return wiki_info
+
+
+def saved_post_images(place, plan):
+    """
+    Search results for a planned post from today's checkpoint, or None.
+    """
+    state = get_run_state()
+    saved = state.get(place, "images") if state is not None else None
+    # Only results for the same events can be reused
+    if saved is None or saved['events'] != plan['events']:
+        return None
+    print(f"Resuming with the image search results fetched earlier for '{place['name']}'")
+    return saved['images'], saved['event_candidates']
+
+
+def post_images(place, plan):
+    """
+    Search results for a planned post, from today's checkpoint if there is one.
+    Returns (current state images, list of event image results in event order).
+    """
+    saved = saved_post_images(place, plan)
+    if saved is not None:
+        return saved
     
-    # Search images for current state section
-    print(f"Searching for current state images of '{place['name']}' using keywords: {keywords}")
-    images = search_images_by_features(
-        place['name'], 
-        place.get('location', ''), 
-        keywords,
-        num_results=5
-    )
+    # Search images for the current state section and every historical event at once
+    print(f"Searching for current state images of '{place['name']}' using keywords: {plan['keywords']}")
+    images, event_candidates = fetch_post_images(place, plan['keywords'], plan['events'])
+    save_post_images(place, plan, images, event_candidates)
+    return images, event_candidates
+
+
+def save_post_images(place, plan, images, event_candidates):
+    state = get_run_state()
+    if state is not None and (images or any(event_candidates)):
+        state.put(place, "images", {
+            "events": plan['events'],
+            "images": images,
+            "event_candidates": event_candidates
+        })
+
+
+def recently_posted(place, today=None):
+    """
+    Returns True if the place was posted within the last RECENT_POST_DAYS days.
+    """
+    last_date = get_post_index().last_posted(place['name'])
+    if last_date is None:
+        return False
+    today = today or datetime.now()
+    return last_date > (today - timedelta(days=RECENT_POST_DAYS)).strftime('%Y-%m-%d')
+
+
+def least_recently_posted(places):
+    """
+    Order places so that places never posted come first, then the ones posted longest ago.
+    Places with the same date keep their order.
+    """
+    index = get_post_index()
+    return sorted(places, key=lambda place: index.last_posted(place['name']) or "")
+
+
+def get_image_mirror():
+    """
+    Returns the local image mirror (None unless MIRROR_IMAGES is set).
+    """
+    global image_mirror
+    if image_mirror is None and MIRROR_IMAGES:
+        image_mirror = ImageMirror(IMAGES_DIR, IMAGES_URL, MIRROR_WIDTHS, MIRROR_WORKERS)
+    return image_mirror
+
+
+def get_site_manifest():
+    """
+    Returns the manifest of generated site files, loading it on first use
+    (None if SITE_MANIFEST is empty). Posts and images that aren't listed yet
+    are added as they are.
+    """
+    global site_manifest
+    if site_manifest is None and SITE_MANIFEST:
+        site_manifest = SiteManifest(SITE_MANIFEST)
+        site_manifest.track(POSTS_DIR, IMAGES_DIR)
+    return site_manifest
+
+
+def save_site_manifest():
+    """
+    Save the manifest at the end of a run, so its list of changed files is
+    the run's own (empty if every post was skipped).
+    """
+    manifest = get_site_manifest()
+    if manifest is not None:
+        manifest.save()
+
+
+def mirror_post_images(images, event_images):
+    """
+    Download the chosen images and point them at the local copies.
+    Images that can't be downloaded keep their source URL.
+    """
+    mirror = get_image_mirror()
+    if mirror is None:
+        return images, event_images
+    urls = [image['url'] for image in images] + [image['url'] for image in event_images if image]
+    print(f"Mirroring {len(urls)} images to {IMAGES_DIR}/...")
+    local_urls = mirror.mirror(urls)
+    print(f"  {len(local_urls)} of {len(urls)} images available locally")
+    manifest = get_site_manifest()
+    if manifest is not None:
+        for path in mirror.written:
+            manifest.record(path)
+        mirror.written.clear()
     
-    if not images:
-        print(f"Warning: No current state images found for '{place['name']}'.")
-        images = []
+    def localize(image):
+        if image and image['url'] in local_urls:
+            return dict(image, url=local_urls[image['url']], source=image['url'])
+        return image
     
-    # Generate post content
-    date = datetime.now()
-    # Convert place name to URL-safe slug
-    place_slug = re.sub(r'[^\w\s-]', '', place['name'])
-    place_slug = re.sub(r'[-\s]+', '-', place_slug)
-    filename = f"{date.strftime('%Y-%m-%d')}-{place_slug.lower()}.md"
-    filepath = POSTS_DIR / filename
+    return [localize(image) for image in images], [localize(image) for image in event_images]
+
+
+def thumbnail_hash(image, phashes):
+    """
+    Perceptual hash of an image's thumbnail (downloaded once per run), or None.
+    """
+    url = image.get('url', '')
+    if url not in phashes:
+        phashes[url] = None
+        if image.get('thumbnail'):
+            try:
+                response = fetch("thumbnail", image['thumbnail'], max_bytes=THUMBNAIL_MAX_BYTES, timeout=10)
+                response.raise_for_status()
+                phashes[url] = average_hash(response.content)
+            except (requests.exceptions.RequestException, CircuitOpenError, ResponseTooLargeError):
+                pass
+    return phashes[url]
+
+
+def pick_unused_image(candidates, post_images, phashes):
+    """
+    Pick the first candidate that neither this post nor an earlier post uses.
+    Falls back to the first candidate not used in this post, or None.
+    The picked image is added to `post_images`.
+    """
+    index = get_post_index()
+    fallback = None
+    for image in candidates:
+        if not image.get('url'):
+            continue
+        phash = thumbnail_hash(image, phashes) if IMAGE_PHASH else None
+        if post_images.find(image['url'], phash) is not None:
+            continue
+        used = index.image_post(image['url'], phash)
+        if used is None and get_image_mirror() is not None:
+            # Earlier posts link mirrored images by their local URL
+            local_url = image_mirror.local_url(image['url'])
+            used = index.image_post(local_url) if local_url else None
+        if used is None:
+            post_images.add(image['url'], phash=phash)
+            return image
+        if fallback is None:
+            fallback = (image, phash)
     
-    # Check if post already exists (prevent duplicates)
-    if filepath.exists():
-        print(f"Warning: {filepath} already exists. Skipping.")
+    if fallback is None:
         return None
+    post_images.add(fallback[0]['url'], phash=fallback[1])
+    return fallback[0]
+
+
+def choose_post_images(images, event_candidates, phashes):
+    """
+    Choose images from the fetched results so no picture appears twice in the
+    post and pictures from earlier posts are avoided when another result exists.
+    Returns (up to IMAGES_PER_POST current state images, one image or None per event).
+    """
+    post_images = ImageIndex()
+    # Events come first in the post, so they get the first pick
+    event_images = [pick_unused_image(candidates, post_images, phashes) for candidates in event_candidates]
+    
+    current_images = []
+    remaining = list(images)
+    while remaining and len(current_images) < IMAGES_PER_POST:
+        image = pick_unused_image(remaining, post_images, phashes)
+        if image is None:
+            break
+        current_images.append(image)
+        remaining.remove(image)
+    
+    return current_images, event_images
+
+
+def plan_image_searches(place, keywords, events):
+    """
+    Plan the current state search and one search per historical event, merging
+    duplicate and overlapping queries (see query_planner.py).
+    Returns ((query, number of results) per search wanted, planned searches).
+    """
+    name = place['name']
+    location = place.get('location', '')
+    queries = [(build_feature_query(name, location, keywords), CURRENT_IMAGE_CANDIDATES)]
+    queries += [(build_event_query(name, location, event), EVENT_IMAGE_CANDIDATES) for event in events]
+    searches = plan_searches(queries, QUERY_MERGE_THRESHOLD)
     
-    # Generate current state image markdown
-    image_markdown = ""
-    if images:
-        image_markdown = "\n\n## Current State\n\n"
-        for i, img in enumerate(images[:5], 1):
-            image_markdown += f"![{place['name']} image {i}]({img['url']})\n\n"
-            image_markdown += f"*{img['title']}*\n\n"
+    saved = quota_saved(queries, searches)
+    metrics.count("quota.search_images.planned", len(searches))
+    metrics.count("quota.search_images.saved", saved)
+    print(f"Image searches: {len(searches)} requests for {len(queries)} queries (quota saved: {saved})")
+    for search in searches:
+        print(f"  Searching images ({search['num']}) with query: {search['query']}")
+    return queries, searches
+
+
+def split_image_results(queries, searches, results):
+    """
+    Returns (current state images, list of event image results in event order)
+    from the results of the planned searches.
+    """
+    per_request = distribute(queries, searches, results)
+    return per_request[0], per_request[1:]
+
+
+@metrics.traced("fetch_post_images")
+def fetch_post_images(place, keywords, events):
+    """
+    Run the planned current state and historical event searches concurrently.
+    Returns (current state images, list of event image results in event order).
+    """
+    queries, searches = plan_image_searches(place, keywords, events)
+    
+    with ThreadPoolExecutor(max_workers=IMAGE_SEARCH_WORKERS) as pool:
+        futures = [pool.submit(search_images, search['query'], search['num']) for search in searches]
+        # Collect results in submission order so the post is the same as a serial run
+        results = [future.result() for future in futures]
     
+    return split_image_results(queries, searches, results)
+
+
+def assemble_post(place, wiki_info, events, event_images, images, date):
+    """
+    Collect the content of a post (see render.render_post for the layout).
+    """
     # Use Wikipedia summary if available, otherwise use default description
     description = place.get('description', '')
     if wiki_info.get('summary'):
@@ -461,141 +977,486 @@ def create_post(place, wiki_info=None):
         sentences = wiki_summary.split('. ')
         description = '. '.join(sentences[:3]) + '.' if len(sentences) > 3 else wiki_summary
     
-    # Generate historical events section with images and descriptions
-    historical_events_text = ""
-    if wiki_info.get('historical_events'):
-        historical_events_text = "\n## Historical Events\n\n"
-        
-        for i, event in enumerate(wiki_info['historical_events'], 1):
-            # Search for image related to this event
-            event_image = search_image_for_event(
-                place['name'], 
-                place.get('location', ''), 
-                event
-            )
-            
-            # Generate concise description (200 characters max)
-            event_description = generate_event_description(event, place['name'])
-            
-            # Add event with image and description
-            historical_events_text += f"### {i}. {event_description}\n\n"
-            
-            if event_image:
-                historical_events_text += f"![{place['name']} historical event {i}]({event_image['url']})\n\n"
-                historical_events_text += f"*{event_image['title']}*\n\n"
-            else:
-                historical_events_text += f"*이미지를 찾을 수 없습니다.*\n\n"
-            
-            # Add delay between image searches to avoid rate limiting
-            if i < len(wiki_info['historical_events']):
-                time.sleep(1)
-    else:
-        # Fallback if no historical events found
-        historical_events_text = "\n## Historical Background\n\n"
-        historical_events_text += f"{place['name']} has a rich history marked by significant events that shaped its current state. "
-        historical_events_text += f"From its founding to its decline, this place has witnessed many historical moments that reflect the changes of time.\n\n"
+    tags = [place['name'], "abandoned places", "current state"]
+    if place.get('location'):
+        tags.append(place['location'])
     
-    # Post content
-    location_text = f" ({place.get('location', '')})" if place.get('location') else ""
-    content = f"""# The Current State of {place['name']}{location_text}
-
-{description}
-
-{historical_events_text}
-
-{image_markdown}
+    return {
+        "name": place['name'],
+        "location": place.get('location', ''),
+        "description": description,
+        # Concise event descriptions (200 characters max) with their images
+        "events": [
+            (generate_event_description(event, place['name']), event_image)
+            for event, event_image in zip(events, event_images)
+        ],
+        "images": images[:IMAGES_PER_POST],
+        "metadata": {
+            "title": f"The Current State of {place['name']}",
+            "date": date.strftime("%Y-%m-%d %H:%M:%S"),
+            "categories": ["Place Exploration"],
+            "tags": tags
+        }
+    }
 
-## Conclusion
 
-We've explored the current state of {place['name']}, a place that was once popular and thriving. While places change with the passage of time, the memories and stories remain.
-"""
+def plan_post(place, wiki_info):
+    """
+    Decide the file and the events of a post.
+    Returns a dictionary for write_post, or None if the post already exists.
+    """
+    # Extract keywords for image search
+    keywords = wiki_info.get('keywords', [])
+    if not keywords:
+        keywords = extract_keywords(place.get('description', ''))
     
-    # Generate front matter
-    post = frontmatter.Post(content)
-    tags = [place['name'], "abandoned places", "current state"]
-    if place.get('location'):
-        tags.append(place['location'])
+    # Generate post content
+    date = datetime.now()
+    filename = f"{date.strftime('%Y-%m-%d')}-{make_slug(place['name'])}.md"
+    filepath = POSTS_DIR / filename
     
-    post.metadata = {
-        "title": f"The Current State of {place['name']}",
-        "date": date.strftime("%Y-%m-%d %H:%M:%S"),
-        "categories": ["Place Exploration"],
-        "tags": tags
+    # Check if post already exists (prevent duplicates) before spending any image searches
+    post_index = get_post_index()
+    if filepath.exists() or post_index.has_post(filename):
+        print(f"Warning: {filepath} already exists. Skipping.")
+        return None
+    
+    # Leave out events that earlier posts about this place already covered
+    events = [
+        event for event in wiki_info.get('historical_events', [])
+        if not post_index.has_event(place['name'], generate_event_description(event, place['name']))
+    ]
+    if not events:
+        events = wiki_info.get('historical_events', [])
+    
+    return {
+        "place": place,
+        "wiki_info": wiki_info,
+        "keywords": keywords,
+        "events": events,
+        "date": date,
+        "filepath": filepath
     }
+
+
+def write_post(plan, images, event_candidates):
+    """
+    Choose the images of a planned post from the search results, then render
+    and save it. Returns the file path, or None if an earlier post has the
+    same content.
+    """
+    place = plan['place']
+    state = get_run_state()
+    rendered = state.get(place, "post") if state is not None else None
+    if rendered is not None:
+        print(f"Resuming with the post rendered earlier for '{place['name']}'")
+    else:
+        rendered = render_planned_post(plan, images, event_candidates)
+        if state is not None:
+            state.put(place, "post", rendered)
+    
+    # Nothing to publish if an earlier post has the same content
+    manifest = get_site_manifest()
+    if manifest is not None:
+        identical = manifest.find_content(rendered['markdown'])
+        if identical is not None:
+            print(f"Warning: the post is identical to {identical}. Skipping.")
+            if state is not None:
+                state.complete(place)
+            return None
     
     # Save file
+    filepath = plan['filepath']
     POSTS_DIR.mkdir(exist_ok=True)
-    with open(filepath, "w", encoding="utf-8") as f:
-        f.write(frontmatter.dumps(post))
+    data = rendered['markdown'].encode("utf-8")
+    with open(filepath, "wb") as f:
+        f.write(data)
+    get_post_index().add(filepath, phashes=rendered['phashes'])
+    if manifest is not None:
+        manifest.record(filepath, data)
+        manifest.save()
+    if state is not None:
+        state.complete(place)
     
     print(f"Post created successfully: {filepath}")
     return filepath
 
 
-def select_place_by_trend():
+def render_planned_post(plan, images, event_candidates):
     """
-    Select a place with the highest Google Trends score.
-    Returns the place with the highest trend score (non-random).
-    Falls back to first place if trends unavailable.
+    Returns {"markdown", "phashes"} of a planned post (phashes: perceptual
+    hashes of its image URLs, for the post index).
     """
-    import random
+    place = plan['place']
+    
+    # Pick from the fetched results so images aren't repeated within or across posts
+    phashes = {}
+    images, event_images = choose_post_images(images, event_candidates, phashes)
+    
+    if not images:
+        print(f"Warning: No current state images found for '{place['name']}'.")
+        images = []
+    
+    images, event_images = mirror_post_images(images, event_images)
+    
+    post = assemble_post(place, plan['wiki_info'], plan['events'], event_images, images, plan['date'])
+    
+    # Mirrored images are indexed by their local URL
+    phashes = {
+        image['url']: phashes.get(image.get('source', image['url']))
+        for image in images + [image for image in event_images if image]
+    }
+    return {
+        "markdown": render_post(post),
+        "phashes": {url: h for url, h in phashes.items() if h is not None}
+    }
+
+
+@metrics.traced("create_post")
+def create_post(place, wiki_info=None):
+    """
+    Generate a blog post based on place information.
+    """
+    # Get Wikipedia info if not provided
+    if wiki_info is None:
+        print(f"Fetching Wikipedia information for '{place['name']}'...")
+        wiki_info = wikipedia_info(place)
+    
+    plan = plan_post(place, wiki_info)
+    if plan is None:
+        return None
+    
+    images, event_candidates = post_images(place, plan)
+    return write_post(plan, images, event_candidates)
+
+
+def get_trend_store():
+    """
+    Return the store of trend scores, opening it on first use.
+    """
+    global trend_store
+    if trend_store is None:
+        trend_store = TrendStore(CACHE_DIR / "trends.sqlite3", max_age=TRENDS_MAX_AGE_DAYS * 24 * 3600)
+    return trend_store
+
+
+def trend_anchor():
+    """
+    The term every Trends batch is compared against.
+    """
+    if TRENDS_ANCHOR:
+        return TRENDS_ANCHOR
+    first = PLACES.first()
+    return build_keyword(first['name'], first.get('location', ''))
+
+
+def selection_candidates(region=None):
+    """
+    Places considered for selection in this run (optionally only one region).
+    Large catalogs are sampled down to SELECTION_SAMPLE_SIZE places, the same
+    sample all day, so the trend refresh and selection agree.
+    """
+    if region:
+        places = PLACES.in_region(region)
+        if len(places) <= SELECTION_SAMPLE_SIZE:
+            return places
+        return Catalog(places).sample(SELECTION_SAMPLE_SIZE, seed=datetime.now().strftime('%Y-%m-%d'))
+    return PLACES.sample(SELECTION_SAMPLE_SIZE, seed=datetime.now().strftime('%Y-%m-%d'))
+
+
+@metrics.traced("refresh_trend_scores")
+def refresh_trend_scores(places=None, limit=TRENDS_REFRESH_PER_RUN):
+    """
+    Fetch Google Trends scores for places whose stored score is missing or stale
+    (at most `limit`, the oldest first; all of them if `limit` is None) and store them.
+    Returns the number of places updated.
+    """
+    if places is None:
+        places = selection_candidates()
     
     if not PTRENDS_AVAILABLE:
-        # Fallback to first place if pytrends not available
-        print("⚠️  pytrends not available, selecting first place from list")
-        return PLACES[0]
+        return 0
+    
+    store = get_trend_store()
+    anchor = trend_anchor()
+    keywords = [build_keyword(place['name'], place.get('location', '')) for place in places]
+    stale = store.stale(anchor, keywords, limit)
+    if not stale:
+        return 0
+    
+    print(f"Refreshing Google Trends scores for {len(stale)} places...")
+    
+    # Score places in batches of up to 5 keywords instead of one request per place
+    scorer = TrendScorer(
+        make_trend_client,
+        anchor=anchor,
+        max_workers=TRENDS_WORKERS,
+        limiter=get_limiter("trends"),
+        keep_frames=True
+    )
+    # Scores are stored after every round of parallel batches, so an interrupted
+    # or failed refresh keeps what it fetched and the next run continues from there
+    step = (MAX_KEYWORDS_PER_PAYLOAD - 1) * TRENDS_WORKERS
+    updated = 0
+    try:
+        for start in range(0, len(stale), step):
+            updated += store.add(anchor, scorer.score_relative(stale[start:start + step]))
+            store.add_series(anchor, scorer.relative_series())
+    finally:
+        print(f"  Updated {updated}/{len(stale)} trend scores")
+    return updated
+
+
+def stored_trend_order(places):
+    """
+    Returns [(place, relative interest, fetched time)] of the places with a
+    stored trend score, highest interest first (best TREND_RANKING score first
+    with a ranking other than "latest").
+    """
+    keywords = [build_keyword(place['name'], place.get('location', '')) for place in places]
+    latest = get_trend_store().latest(trend_anchor(), keywords)
+    
+    ranked = []
+    for place, keyword in zip(places, keywords):
+        if keyword in latest:
+            fetched, relative = latest[keyword]
+            ranked.append((place, relative, fetched))
+    
+    scores = trend_ranking_scores(places, keywords)
+    if scores is None:
+        # Sort by interest relative to the anchor (highest first)
+        ranked.sort(key=lambda x: x[1], reverse=True)
+    else:
+        # Places the ranking can't score (no history in the window) go last
+        order = {id(place): score for place, score in zip(places, scores)}
+        ranked.sort(key=lambda x: order[id(x[0])], reverse=True)
+    return ranked
+
+
+@metrics.traced("trend_ranking_scores")
+def trend_ranking_scores(places, keywords):
+    """
+    Score places with the TREND_RANKING function over their stored daily
+    interest, all at once. Returns a list of scores (-inf: not enough data),
+    or None when places are ranked by their latest score.
+    """
+    if TREND_RANKING == "latest":
+        return None
+    if not PANDAS_AVAILABLE:
+        print(f"⚠️  TREND_RANKING={TREND_RANKING} needs pandas. Ranking by latest score.")
+        return None
+    if TREND_RANKING not in trend_analytics.RANKERS:
+        print(f"⚠️  Unknown TREND_RANKING {TREND_RANKING!r}. Ranking by latest score.")
+        return None
+    
+    today = int(time.time() // 86400)
+    rows = get_trend_store().daily(trend_anchor(), today - TREND_WINDOW_DAYS + 1)
+    matrix = trend_analytics.interest_matrix(rows, keywords, today, TREND_WINDOW_DAYS)
+    index = get_post_index()
+    elapsed = trend_analytics.days_since([index.last_posted(place['name']) for place in places], today)
+    features = trend_analytics.trend_features(matrix, keywords, elapsed)
+    return trend_analytics.rank_scores(features, TREND_RANKING).fillna(float("-inf")).tolist()
+
+
+@metrics.traced("rank_places_by_trend")
+def rank_places_by_trend(places=None):
+    """
+    Rank places by their stored Google Trends scores.
+    Returns a list of (place, score) sorted by score (highest first). Places
+    without a stored score are left out; the list is empty if no place has one.
+    """
+    if places is None:
+        places = selection_candidates()
     
-    print("Checking Google Trends for all places...")
     place_scores = []
-    successful_scores = 0
+    for place, relative, fetched in stored_trend_order(places):
+        score = display_score(relative)
+        place_scores.append((place, score))
+        print(f"  {place['name']}: Trend score = {score} ({datetime.fromtimestamp(fetched).strftime('%Y-%m-%d')})")
+    
+    return place_scores
+
+
+def select_place_by_trend(places=None):
+    """
+    Select a place with the highest Google Trends score.
+    Returns the place with the highest stored trend score (non-random) that
+    wasn't posted in the last RECENT_POST_DAYS days, among `places` (default:
+    this run's selection candidates).
+    Falls back to the least recently posted place if no scores are stored.
+    """
+    if places is None:
+        places = selection_candidates()
+    
+    place_scores = rank_places_by_trend(places)
+    
+    # Nothing stored yet (pytrends unavailable or every request rate limited)
+    if not place_scores:
+        print("\n⚠️  No Google Trends scores available. Selecting least recently posted place.")
+        return least_recently_posted(places)[0]
+    
+    # Select the place with the highest trend score (non-random), skipping recent posts
+    for selected_place, highest_score in place_scores:
+        if not recently_posted(selected_place):
+            print(f"\n✅ Selected place with highest trend score: {selected_place['name']} (score: {highest_score})")
+            return selected_place
+        print(f"  Skipping {selected_place['name']}: posted within the last {RECENT_POST_DAYS} days")
+    
+    print("\n⚠️  All places were posted recently. Selecting least recently posted place.")
+    return least_recently_posted(places)[0]
+
+
+def choose_place(candidates):
+    """
+    The place to post about: the one selected earlier today if its post wasn't
+    written yet, otherwise the place selected by trend score.
+    """
+    state = get_run_state()
+    if state is not None and state.selected():
+        place = PLACES.find(state.selected())
+        if place is not None:
+            print(f"\nResuming with the place selected earlier today: {place['name']}")
+            return place
+    place = select_place_by_trend(candidates)
+    if state is not None:
+        state.select(place)
+    return place
+
+
+def find_places(names):
+    """
+    Look up places by name or slug (case-insensitive).
+    Unknown names are reported and skipped.
+    """
+    places = []
+    for name in names:
+        place = PLACES.find(name)
+        if place is None:
+            print(f"⚠️  Unknown place: {name.strip()}")
+            continue
+        places.append(place)
+    return places
+
+
+def print_wiki_summary(wiki_info):
+    """
+    Print what was found on Wikipedia for a place.
+    """
+    if wiki_info.get('summary'):
+        print(f"   Found Wikipedia page: {wiki_info.get('title', 'N/A')}")
+        print(f"   Extracted keywords: {', '.join(wiki_info.get('keywords', []))}")
+        if wiki_info.get('historical_events'):
+            print(f"   Found {len(wiki_info['historical_events'])} historical events")
+    else:
+        print("   Wikipedia information not available, using default description")
+
+
+def generate_batch(places):
+    """
+    Generate one post per place in a single run.
+    The HTTP session and caches are shared by all posts, and the Wikipedia fetch
+    for the next place runs while the images for the current place are searched.
+    Returns a list of (place, post path or None, seconds).
+    """
+    results = []
+    batch_start = time.perf_counter()
     
-    for i, place in enumerate(PLACES):
-        place_name = place['name']
-        location = place.get('location', '')
+    with ThreadPoolExecutor(max_workers=1) as prefetch:
+        next_wiki = None
+        if places:
+            next_wiki = prefetch.submit(wikipedia_info, places[0])
         
-        try:
-            # Get trend score
-            score = get_trend_score(place_name, location)
-            place_scores.append((place, score))
+        for k, place in enumerate(places):
+            post_start = time.perf_counter()
+            print("\n" + "="*50)
+            print(f"[{k + 1}/{len(places)}] {place['name']}")
+            print("="*50)
             
-            # Only count non-default scores as successful
-            if score != 50:
-                successful_scores += 1
+            wiki_info = next_wiki.result()
+            if k + 1 < len(places):
+                upcoming = places[k + 1]
+                next_wiki = prefetch.submit(wikipedia_info, upcoming)
             
-            print(f"  {place_name}: Trend score = {score}")
+            print_wiki_summary(wiki_info)
+            post_path = create_post(place, wiki_info)
             
-            # Longer delay to avoid rate limiting (3 seconds between requests)
-            if i < len(PLACES) - 1:  # Don't sleep after last item
-                time.sleep(3)
-        except KeyboardInterrupt:
-            print("\n⚠️  Interrupted by user. Using scores collected so far...")
-            break
-        except Exception as e:
-            print(f"  ⚠️  Skipping {place_name} due to error: {type(e).__name__}")
-            place_scores.append((place, 50))  # Default score
-            if i < len(PLACES) - 1:
-                time.sleep(1)  # Shorter delay on error
+            elapsed = time.perf_counter() - post_start
+            results.append((place, post_path, elapsed))
+            status = "✅" if post_path else "❌"
+            print(f"{status} {place['name']}: {elapsed:.2f}s")
     
-    # If we got rate limited (all scores are 50), use first place
-    if successful_scores == 0:
-        print("\n⚠️  Google Trends rate limited. Selecting first place from list.")
-        return PLACES[0]
-    
-    # Sort by trend score (highest first)
-    place_scores.sort(key=lambda x: x[1], reverse=True)
-    
-    # Select the place with the highest trend score (non-random)
-    selected_place, highest_score = place_scores[0]
-    print(f"\n✅ Selected place with highest trend score: {selected_place['name']} (score: {highest_score})")
+    total = time.perf_counter() - batch_start
+    created = sum(1 for _, post_path, _ in results if post_path)
+    print("\n" + "="*50)
+    print(f"Batch finished: {created}/{len(results)} posts created in {total:.2f}s")
+    for place, post_path, elapsed in results:
+        print(f"  {place['name']}: {elapsed:.2f}s" + ("" if post_path else " (skipped)"))
+    if results:
+        print(f"  Average per post: {total / len(results):.2f}s")
     
-    return selected_place
+    return results
 
 
-def main():
+def batch_places(candidates, names=None, count=None):
+    """
+    Places of a batch: the named ones, or the candidates by stored trend score
+    (then least recently posted), with recently posted places last.
+    """
+    if names:
+        places = find_places(names.split(","))
+    else:
+        # The stored trend scores rank every place for the whole batch
+        print("\n" + "="*50)
+        print("Ranking places based on Google Trends...")
+        print("="*50)
+        place_scores = rank_places_by_trend(candidates)
+        ranked = [place for place, _ in place_scores]
+        if not ranked:
+            print("\n⚠️  No Google Trends scores available. Using least recently posted places.")
+        # Places without a stored score follow the ranked ones
+        ranked_ids = {id(place) for place in ranked}
+        places = ranked + least_recently_posted([p for p in candidates if id(p) not in ranked_ids])
+        # Places posted recently go last
+        places = [p for p in places if not recently_posted(p)] + \
+            least_recently_posted([p for p in places if recently_posted(p)])
+    if count:
+        places = places[:count]
+    return places
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Generate blog posts about places that were once popular.")
+    parser.add_argument("--batch", type=int, metavar="N",
+                        help="generate posts for the N places with the highest trend scores")
+    parser.add_argument("--places", metavar="A,B,C",
+                        help="comma-separated place names (or slugs) to generate posts for")
+    parser.add_argument("--region", metavar="REGION",
+                        help="only select places in this region (the last part of the location, e.g. Japan)")
+    parser.add_argument("--refresh-trends", type=int, nargs="?", const=0, metavar="N",
+                        help="only refresh stale trend scores (at most N places, default all) and exit")
+    parser.add_argument("--async", dest="use_async", action="store_true",
+                        help="run the stages with the asyncio driver (see pipeline_async.py)")
+    parser.add_argument("--stage-timeout", action="append", metavar="STAGE=SECONDS",
+                        help="timeout of an asyncio driver stage (0: none); can be repeated")
+    parser.add_argument("--timeout", type=float, metavar="SECONDS",
+                        help="cancel the asyncio driver run after this many seconds")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
     """
     Main function: Select a place based on trends and generate a post.
+    With --batch or --places, generate several posts in one run.
     """
-    import random
+    args = parse_args(argv)
+    
+    if METRICS_FILE:
+        metrics.enable(METRICS_FILE)
+    
+    if REPLAY_MODE:
+        from replay import Fixtures, Replay
+        print(f"Replay mode: {REPLAY_MODE} ({REPLAY_DIR})")
+        Replay(sys.modules[__name__], REPLAY_MODE, Fixtures(REPLAY_DIR)).install()
     
     # Check API key and CSE ID
     if not CUSTOM_SEARCH_ENGINE_ID or CUSTOM_SEARCH_ENGINE_ID == "YOUR_CSE_ID_HERE":
@@ -607,40 +1468,98 @@ def main():
         print("Warning: GOOGLE_API_KEY is not set.")
         return
     
-    # Select place based on Google Trends score
-    print("\n" + "="*50)
-    print("Selecting place based on Google Trends...")
-    print("="*50)
+    candidates = selection_candidates(args.region)
+    if not candidates:
+        print(f"Warning: no places found{f' in region {args.region}' if args.region else ''}.")
+        return
     
-    place = select_place_by_trend()
+    if args.refresh_trends is not None:
+        refresh_trend_scores(candidates, limit=args.refresh_trends or None)
+        return
     
-    print(f"\n✅ Selected place: {place['name']}")
-    if place.get('location'):
-        print(f"   Location: {place['location']}")
+    if args.use_async:
+        from pipeline_async import AsyncPipeline, parse_stage_timeouts
+        try:
+            timeouts = parse_stage_timeouts(args.stage_timeout)
+        except ValueError as e:
+            print(f"Invalid --stage-timeout: {e}")
+            return
+        pipeline = AsyncPipeline(sys.modules[__name__], timeouts, workers=ASYNC_WORKERS)
+        choose = None
+        if args.places or args.batch:
+            choose = lambda places: batch_places(places, args.places, args.batch)
+        results = pipeline.run(candidates, choose, timeout=args.timeout)
+        created = sum(1 for _, post_path in results if post_path)
+        print(f"\nAsync run finished: {created}/{len(results)} posts created")
+        save_site_manifest()
+        print_run_summary()
+        return
     
-    # Get Wikipedia information
-    print(f"\nFetching information about {place['name']}...")
-    wiki_info = get_wikipedia_info(place['name'], place.get('location', ''))
+    # Refresh a few stale trend scores in the background while posts are generated
+    background = ThreadPoolExecutor(max_workers=1)
+    refresh = None
+    if get_trend_store().latest(trend_anchor()):
+        refresh = background.submit(refresh_trend_scores, candidates)
+    else:
+        # Nothing stored yet: refresh first so there is something to rank
+        refresh_trend_scores(candidates)
     
-    if wiki_info.get('summary'):
-        print(f"   Found Wikipedia page: {wiki_info.get('title', 'N/A')}")
-        print(f"   Extracted keywords: {', '.join(wiki_info.get('keywords', []))}")
-        if wiki_info.get('historical_events'):
-            print(f"   Found {len(wiki_info['historical_events'])} historical events")
+    if args.places or args.batch:
+        generate_batch(batch_places(candidates, args.places, args.batch))
     else:
-        print("   Wikipedia information not available, using default description")
+        # Select place based on Google Trends score
+        print("\n" + "="*50)
+        print("Selecting place based on Google Trends...")
+        print("="*50)
+        
+        place = choose_place(candidates)
+        
+        print(f"\n✅ Selected place: {place['name']}")
+        if place.get('location'):
+            print(f"   Location: {place['location']}")
+        
+        # Get Wikipedia information
+        print(f"\nFetching information about {place['name']}...")
+        wiki_info = wikipedia_info(place)
+        print_wiki_summary(wiki_info)
+        
+        print("\n" + "="*50)
+        
+        # Generate post with Wikipedia info
+        post_path = create_post(place, wiki_info)
+        
+        if post_path:
+            print(f"\n✅ Post generated successfully: {post_path}")
+        else:
+            print("\n❌ Failed to generate post.")
     
-    print("\n" + "="*50)
+    if refresh is not None:
+        try:
+            refresh.result()
+        except Exception as e:
+            print(f"⚠️  Trend score refresh failed: {type(e).__name__}: {e}")
+    background.shutdown()
     
-    # Generate post with Wikipedia info
-    post_path = create_post(place, wiki_info)
+    save_site_manifest()
+    print_run_summary()
+
+
+def print_run_summary():
+    """
+    Print cache statistics and, when metrics are enabled, per-stage times and counters.
+    """
+    if image_cache is not None:
+        stats = image_cache.stats()
+        print(f"Image search cache: {stats['hits']} hits, {stats['misses']} misses, {stats['entries']} entries")
     
-    if post_path:
-        print(f"\n✅ Post generated successfully: {post_path}")
-    else:
-        print("\n❌ Failed to generate post.")
+    if metrics.enabled():
+        totals, counters = metrics.summary()
+        for name, entry in sorted(totals.items(), key=lambda item: -item[1]['total']):
+            print(f"  {name}: {entry['count']} calls, {entry['total']:.2f}s")
+        for name, value in sorted(counters.items()):
+            print(f"  {name}: {value}")
+        print(f"Metrics written to {METRICS_FILE}")
 
 
 if __name__ == "__main__":
     main()
-
@@ -0,0 +1,247 @@
+"""
+Shared HTTP session for the post generation script.
+One pooled requests.Session is reused for all API calls so connections
+are kept alive across requests and threads; responses are gzip-compressed
+when the server supports it.
+
+Every host has a timeout and a largest response it is allowed to send
+(configure_host). Bodies are streamed and the download stops as soon as it
+goes over the limit, so one oversized response can't use unbounded memory.
+JSON responses can be parsed incrementally, keeping only the fields that are
+needed (requires ijson; otherwise the bounded body is parsed as a whole).
+"""
+
+import json
+import threading
+from urllib.parse import urlsplit
+
+import metrics
+from lazy import LazyModule, module_available
+from ratelimit import get_limiter, parse_retry_after
+
+# requests is imported with the first session
+requests = LazyModule("requests")
+
+IJSON_AVAILABLE = module_available("ijson")
+if IJSON_AVAILABLE:
+    ijson = LazyModule("ijson")
+
+# Responses worth retrying after a pause
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+# (connect, read) timeout in seconds and largest body in bytes of hosts without their own
+DEFAULT_TIMEOUT = (5, 20)
+DEFAULT_MAX_BYTES = 20 * 1024 * 1024
+
+# Bytes read from a response at a time
+CHUNK_SIZE = 64 * 1024
+
+# host -> {"timeout", "max_bytes"}
+_hosts = {}
+
+_session = None
+_lock = threading.Lock()
+
+
+class ResponseTooLargeError(Exception):
+    """
+    Raised when a response body is larger than the limit of its host.
+    """
+
+
+def configure_host(host, timeout=None, max_bytes=None):
+    """
+    Set the timeout (seconds, or a (connect, read) tuple) and the largest
+    response body of a host. None keeps the current value.
+    """
+    limits = _hosts.setdefault(host, {"timeout": DEFAULT_TIMEOUT, "max_bytes": DEFAULT_MAX_BYTES})
+    if timeout is not None:
+        limits["timeout"] = timeout
+    if max_bytes is not None:
+        limits["max_bytes"] = max_bytes
+
+
+def host_limits(url):
+    """
+    Returns (timeout, max_bytes) for a URL.
+    """
+    limits = _hosts.get(urlsplit(url).hostname or "")
+    if limits is None:
+        return DEFAULT_TIMEOUT, DEFAULT_MAX_BYTES
+    return limits["timeout"], limits["max_bytes"]
+
+
+def get_session(pool_size=10):
+    """
+    Return the shared requests.Session, creating it on first use.
+    """
+    global _session
+    with _lock:
+        if _session is None:
+            from requests.adapters import HTTPAdapter
+            session = requests.Session()
+            session.headers["Accept-Encoding"] = "gzip, deflate"
+            adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+            _session = session
+        return _session
+
+
+def iter_body(response, max_bytes):
+    """
+    Yield the decompressed body of a streamed response in chunks and release
+    its connection. Raises ResponseTooLargeError once more than `max_bytes`
+    were received (before reading anything if Content-Length is larger).
+    """
+    # Without the query string, which can hold API keys
+    url = urlsplit(response.url)._replace(query="").geturl()
+    try:
+        length = response.headers.get("Content-Length")
+        if length is not None and length.isdigit() and int(length) > max_bytes:
+            raise ResponseTooLargeError(f"{url}: {int(length)} bytes (limit {max_bytes})")
+        received = 0
+        for chunk in response.iter_content(CHUNK_SIZE):
+            received += len(chunk)
+            if received > max_bytes:
+                raise ResponseTooLargeError(f"{url}: over {max_bytes} bytes")
+            yield chunk
+    finally:
+        response.close()
+
+
+def read_body(response, max_bytes):
+    """
+    Read the body of a streamed response, at most `max_bytes` of it.
+    """
+    return b"".join(iter_body(response, max_bytes))
+
+
+def fetch(endpoint, url, pool_size=10, max_bytes=None, stream=False, **kwargs):
+    """
+    GET a URL through the shared limiter of `endpoint`.
+    Timeouts, connection errors, 429s and 5xx responses are retried after the
+    Retry-After time or a backoff. Returns the last response (check its status),
+    raises the last network error, or raises CircuitOpenError if the endpoint
+    keeps failing.
+
+    The timeout and `max_bytes` default to the limits of the URL's host. With
+    `stream` the body is left unread (read it with iter_body or read_body);
+    otherwise it is read here, and ResponseTooLargeError is raised if it is
+    larger than `max_bytes`.
+    """
+    timeout, host_max_bytes = host_limits(url)
+    kwargs.setdefault("timeout", timeout)
+    max_bytes = max_bytes or host_max_bytes
+    limiter = get_limiter(endpoint)
+    session = get_session(pool_size)
+    for attempt in range(limiter.max_retries + 1):
+        last = attempt == limiter.max_retries
+        limiter.acquire()
+        metrics.count(f"api_calls.{endpoint}")
+        try:
+            response = session.get(url, stream=True, **kwargs)
+        except (requests.exceptions.Timeout, requests.exceptions.ConnectionError) as e:
+            if isinstance(e, requests.exceptions.Timeout):
+                metrics.count(f"timeouts.{endpoint}")
+            limiter.record_failure()
+            if last:
+                raise
+            metrics.count(f"retries.{endpoint}")
+            continue
+
+        if response.status_code not in RETRY_STATUSES:
+            limiter.record_success()
+            break
+
+        rate_limited = response.status_code == 429
+        if rate_limited:
+            metrics.count(f"rate_limited.{endpoint}")
+        limiter.record_failure(parse_retry_after(response.headers.get("Retry-After")), rate_limited)
+        if last:
+            break
+        response.close()
+        metrics.count(f"retries.{endpoint}")
+
+    if not stream:
+        try:
+            body = read_body(response, max_bytes)
+        except ResponseTooLargeError:
+            metrics.count(f"too_large.{endpoint}")
+            raise
+        # Like Response.content after reading the body, so .content, .text and .json() work
+        response._content = body
+        response._content_consumed = True
+    return response
+
+
+def _path(prefix, name):
+    return f"{prefix}.{name}" if prefix else name
+
+
+def _select(value, path):
+    for key in path.split("."):
+        if not isinstance(value, dict):
+            return None
+        value = value.get(key)
+    return value
+
+
+def parse_records(chunks, array, fields, extra=()):
+    """
+    Parse a JSON document from byte chunks, keeping only some of its values.
+    Returns (records, extras): for each object of the array at the dotted path
+    `array`, a dictionary of the scalar values at the dotted paths `fields`
+    within it (missing ones left out), and a dictionary of the values at the
+    top-level dotted paths `extra`. With ijson the other values are skipped
+    while parsing; otherwise the document is parsed as a whole first.
+    Raises ValueError for invalid JSON.
+    """
+    fields = set(fields)
+    extra = set(extra)
+    if not IJSON_AVAILABLE:
+        document = json.loads(b"".join(chunks) or b"null")
+        items = _select(document, array) if isinstance(document, dict) else None
+        records = []
+        for item in items if isinstance(items, list) else []:
+            record = {field: _select(item, field) for field in fields}
+            records.append({field: value for field, value in record.items() if value is not None})
+        extras = {}
+        if isinstance(document, dict):
+            for path in extra:
+                value = _select(document, path)
+                if value is not None:
+                    extras[path] = value
+        return records, extras
+
+    item_prefix = _path(array, "item")
+    wanted = {_path(item_prefix, field): field for field in fields}
+    records, extras = [], {}
+    record = None
+
+    def handle(events):
+        nonlocal record
+        for prefix, event, value in events:
+            if prefix == item_prefix and event == "start_map":
+                record = {}
+            elif prefix == item_prefix and event == "end_map":
+                records.append(record)
+                record = None
+            elif event in ("string", "number", "boolean"):
+                if record is not None and prefix in wanted:
+                    record[wanted[prefix]] = value
+                elif prefix in extra:
+                    extras[prefix] = value
+        del events[:]
+
+    events = ijson.sendable_list()
+    parser = ijson.parse_coro(events)
+    try:
+        for chunk in chunks:
+            parser.send(chunk)
+            handle(events)
+        parser.close()
+    except ijson.JSONError as e:
+        raise ValueError(str(e)) from e
+    handle(events)
+    return records, extras
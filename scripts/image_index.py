@@ -0,0 +1,108 @@
+"""
+Index of images used by earlier posts.
+Images are matched by a normalized URL and, optionally, by a perceptual hash
+of their thumbnail, so the same picture isn't posted twice.
+"""
+
+import io
+from urllib.parse import parse_qsl, unquote, urlencode, urlsplit
+
+from lazy import module_available
+
+# Pillow is imported with the first hash
+PIL_AVAILABLE = module_available("PIL")
+
+# Query parameters that only select a size, crop or signature of the same image
+_VARIANT_PARAMS = {
+    "s", "w", "h", "k", "c", "width", "height", "resize", "fit", "crop", "quality",
+    "format", "auto", "dpr", "ixlib", "ixid", "fm", "q"
+}
+
+# Perceptual hashes within this many differing bits are the same picture
+PHASH_MAX_DISTANCE = 3
+# 64-bit hashes are split into bands; two hashes within PHASH_MAX_DISTANCE bits
+# always share at least one band exactly, so only those candidates are compared
+_PHASH_BANDS = PHASH_MAX_DISTANCE + 1
+_BAND_BITS = 64 // _PHASH_BANDS
+
+
+def normalize_image_url(url):
+    """
+    Build a key that is the same for size and format variants of one image URL.
+    """
+    parts = urlsplit(url.strip())
+    host = parts.netloc.lower()
+    if host.startswith("www."):
+        host = host[4:]
+    path = unquote(parts.path)
+
+    # Wikimedia thumbnails: /wikipedia/en/thumb/9/95/Name.jpg/250px-Name.jpg
+    if host == "upload.wikimedia.org" and "/thumb/" in path:
+        path = path.replace("/thumb/", "/", 1).rsplit("/", 1)[0]
+
+    query = sorted((k, v) for k, v in parse_qsl(parts.query) if k.lower() not in _VARIANT_PARAMS)
+    key = host + path
+    if query:
+        key += "?" + urlencode(query)
+    return key
+
+
+def average_hash(image_bytes, size=8):
+    """
+    Returns a 64-bit average hash of an image, or None if it can't be computed.
+    """
+    if not PIL_AVAILABLE:
+        return None
+    from PIL import Image
+    try:
+        image = Image.open(io.BytesIO(image_bytes)).convert("L").resize((size, size))
+    except Exception:
+        return None
+    pixels = list(image.getdata())
+    mean = sum(pixels) / len(pixels)
+    value = 0
+    for pixel in pixels:
+        value = (value << 1) | (pixel >= mean)
+    return value
+
+
+def _bands(phash):
+    mask = (1 << _BAND_BITS) - 1
+    return [(i, (phash >> (i * _BAND_BITS)) & mask) for i in range(_PHASH_BANDS)]
+
+
+class ImageIndex:
+    """
+    Set of used images with constant-time lookups by URL key or perceptual hash.
+    """
+
+    def __init__(self):
+        self._urls = {}
+        self._bands = {}
+
+    def add(self, url, post=None, phash=None):
+        """
+        Record an image used by a post.
+        """
+        self._urls.setdefault(normalize_image_url(url), post)
+        if phash is not None:
+            for band in _bands(phash):
+                self._bands.setdefault(band, []).append((phash, post))
+
+    def find(self, url, phash=None):
+        """
+        Returns the post that used this image (or a near-identical one), or None.
+        Returns "" for images used but not tied to a post.
+        """
+        key = normalize_image_url(url)
+        if key in self._urls:
+            return self._urls[key] or ""
+        if phash is not None:
+            for band in _bands(phash):
+                for other, post in self._bands.get(band, ()):
+                    if bin(phash ^ other).count("1") <= PHASH_MAX_DISTANCE:
+                        return post or ""
+        return None
+
+    def __contains__(self, url):
+        return normalize_image_url(url) in self._urls
@@ -0,0 +1,215 @@
+"""
+Local mirror of the images used in posts.
+Images are downloaded concurrently through the shared HTTP session and stored
+by content hash, so a picture found under several URLs is stored once.
+Resized WebP variants are made in a process pool (requires Pillow). A manifest
+maps source URLs to hashes, so images that were mirrored before are not
+downloaded again.
+"""
+
+import hashlib
+import io
+import json
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from pathlib import Path
+
+import metrics
+from cache import write_atomic, write_json
+from http_client import ResponseTooLargeError, fetch, read_body
+from image_index import normalize_image_url
+from lazy import LazyModule, module_available
+from ratelimit import CircuitOpenError
+
+requests = LazyModule("requests")
+
+PIL_AVAILABLE = module_available("PIL")
+
+MANIFEST_VERSION = 1
+# Unpublished, like site_manifest.MANIFEST_NAME
+MANIFEST_NAME = "_index.json"
+
+# Downloads larger than this are skipped
+MAX_IMAGE_BYTES = 15 * 1024 * 1024
+
+_EXTENSIONS = {
+    "image/jpeg": ".jpg",
+    "image/png": ".png",
+    "image/gif": ".gif",
+    "image/webp": ".webp",
+}
+
+
+def content_hash(data):
+    """
+    Name of an image in the mirror: the first 32 hex digits of its SHA-256.
+    """
+    return hashlib.sha256(data).hexdigest()[:32]
+
+
+def make_variants(path, widths, quality=80):
+    """
+    Write WebP copies of an image at each width (never wider than the image)
+    next to it. Runs in a worker process. Returns [(width, file name)].
+    """
+    from PIL import Image
+
+    path = Path(path)
+    digest = path.stem
+    created = []
+    with Image.open(path) as image:
+        image.load()
+        if image.mode not in ("RGB", "RGBA"):
+            image = image.convert("RGBA" if "transparency" in image.info else "RGB")
+        for width in sorted(set(widths)):
+            width = min(width, image.width)
+            name = f"{digest}-{width}.webp"
+            target = path.with_name(name)
+            if not target.exists():
+                height = max(1, round(image.height * width / image.width))
+                resized = image if width == image.width else image.resize((width, height), Image.LANCZOS)
+                buffer = io.BytesIO()
+                resized.save(buffer, "WEBP", quality=quality, method=4)
+                write_atomic(target, buffer.getvalue())
+            created.append((width, name))
+            if width == image.width:
+                break
+    return created
+
+
+class ImageMirror:
+    """
+    Content-addressed image store in `directory`, published under `url_prefix`.
+    """
+
+    def __init__(self, directory, url_prefix, widths=(480, 1024), workers=6, processes=None,
+                 timeout=20, max_bytes=MAX_IMAGE_BYTES):
+        self.directory = Path(directory)
+        self.url_prefix = url_prefix.rstrip("/")
+        self.widths = tuple(widths)
+        self.workers = workers
+        self.processes = processes
+        self.timeout = timeout
+        self.max_bytes = max_bytes
+        self.manifest_path = self.directory / MANIFEST_NAME
+        # normalized source URL -> hash, hash -> {"file", "variants": {width: file}}
+        self.urls = {}
+        self.files = {}
+        # Paths of the files this process wrote (originals and variants)
+        self.written = []
+        self._load()
+
+    def _load(self):
+        try:
+            data = json.loads(self.manifest_path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return
+        if data.get("version") == MANIFEST_VERSION:
+            self.urls = data.get("urls", {})
+            self.files = data.get("files", {})
+
+    def save(self):
+        data = {"version": MANIFEST_VERSION, "urls": self.urls, "files": self.files}
+        write_json(self.manifest_path, data, sort_keys=True, indent=1)
+
+    def _path(self, name):
+        # Two-character subdirectories keep directory listings short
+        return self.directory / name[:2] / name
+
+    def _stored(self, digest):
+        entry = self.files.get(digest)
+        return entry is not None and self._path(entry["file"]).exists()
+
+    def local_url(self, url):
+        """
+        Returns the published URL of a mirrored source URL, or None.
+        The largest WebP variant is used when there is one.
+        """
+        digest = self.urls.get(normalize_image_url(url))
+        if digest is None or not self._stored(digest):
+            return None
+        entry = self.files[digest]
+        variants = entry.get("variants") or {}
+        name = variants[max(variants, key=int)] if variants else entry["file"]
+        return f"{self.url_prefix}/{name[:2]}/{name}"
+
+    def _download(self, url):
+        # Returns (hash, extension, bytes or None if already stored), or None on failure
+        try:
+            # The body is only downloaded if the response is an image, and only up to max_bytes
+            response = fetch("image_download", url, max_bytes=self.max_bytes, stream=True, timeout=self.timeout)
+            response.raise_for_status()
+            content_type = response.headers.get("Content-Type", "").split(";")[0].strip().lower()
+            extension = _EXTENSIONS.get(content_type)
+            if extension is None:
+                response.close()
+                print(f"  ⚠️  Not an image ({content_type or 'unknown type'}): {url}")
+                return None
+            data = read_body(response, self.max_bytes)
+        except ResponseTooLargeError:
+            print(f"  ⚠️  Image too large (over {self.max_bytes // 1024} KB): {url}")
+            return None
+        except (requests.exceptions.RequestException, CircuitOpenError) as e:
+            if getattr(e, "response", None) is not None:
+                e.response.close()
+            print(f"  ⚠️  Could not download {url}: {type(e).__name__}")
+            return None
+        digest = content_hash(data)
+        return digest, extension, None if self._stored(digest) else data
+
+    @metrics.traced("mirror_images")
+    def mirror(self, urls):
+        """
+        Mirror images and return {source URL: local URL} for the ones that are
+        available locally. Already mirrored URLs and contents are skipped.
+        """
+        pending = []
+        for url in dict.fromkeys(u for u in urls if u):
+            if self.local_url(url) is None:
+                pending.append(url)
+        metrics.count("images.mirror_skipped", len(urls) - len(pending))
+
+        new_files = []
+        if pending:
+            with ThreadPoolExecutor(max_workers=self.workers) as executor:
+                results = list(executor.map(self._download, pending))
+            for url, result in zip(pending, results):
+                if result is None:
+                    continue
+                digest, extension, data = result
+                self.urls[normalize_image_url(url)] = digest
+                if data is None or digest in self.files and self._stored(digest):
+                    metrics.count("images.mirror_duplicates")
+                    continue
+                name = digest + extension
+                path = self._path(name)
+                path.parent.mkdir(parents=True, exist_ok=True)
+                path.write_bytes(data)
+                self.written.append(path)
+                self.files[digest] = {"file": name, "variants": {}}
+                new_files.append(digest)
+                metrics.count("images.mirror_downloaded")
+
+        if new_files and PIL_AVAILABLE and self.widths:
+            self._make_variants(new_files)
+        if pending:
+            self.save()
+        local_urls = {}
+        for url in urls:
+            local = self.local_url(url) if url else None
+            if local is not None:
+                local_urls[url] = local
+        return local_urls
+
+    def _make_variants(self, digests):
+        paths = [self._path(self.files[digest]["file"]) for digest in digests]
+        with ProcessPoolExecutor(max_workers=self.processes) as executor:
+            futures = [executor.submit(make_variants, str(path), self.widths) for path in paths]
+            for digest, future in zip(digests, futures):
+                try:
+                    variants = future.result()
+                except Exception as e:
+                    # Pillow can't read it: the original is used as is
+                    print(f"  ⚠️  Could not resize {self.files[digest]['file']}: {type(e).__name__}")
+                    continue
+                self.files[digest]["variants"] = {str(width): name for width, name in variants}
+                self.written.extend(self._path(name) for _, name in variants)
@@ -0,0 +1,46 @@
+"""
+Deferred imports for the post generation script.
+Heavy optional packages (pytrends pulls in pandas) are only imported when
+a code path actually uses them, which keeps startup fast.
+"""
+
+import importlib
+import importlib.util
+import threading
+
+
+def module_available(name):
+    """
+    Returns True if a top-level module can be imported, without importing it.
+    """
+    return importlib.util.find_spec(name) is not None
+
+
+class LazyModule:
+    """
+    Stand-in for a module that imports it on first attribute access.
+    `setup(module)` runs once after the import.
+    """
+
+    def __init__(self, name, setup=None):
+        self._name = name
+        self._setup = setup
+        self._module = None
+        self._lock = threading.Lock()
+
+    def _load(self):
+        if self._module is None:
+            with self._lock:
+                if self._module is None:
+                    module = importlib.import_module(self._name)
+                    if self._setup is not None:
+                        self._setup(module)
+                    self._module = module
+        return self._module
+
+    def __getattr__(self, attribute):
+        return getattr(self._load(), attribute)
+
+    def __repr__(self):
+        state = "loaded" if self._module is not None else "not loaded"
+        return f"<lazy module {self._name!r} ({state})>"
@@ -0,0 +1,89 @@
+"""
+Single-pass keyword matching.
+All keywords are compiled into one case-insensitive regular expression so a
+text is scanned once, no matter how many keywords are looked for.
+"""
+
+import re
+
+
+def _trie_pattern(words):
+    # Build an alternation that shares common prefixes ("dec(?:ay|ayed|line)"),
+    # which the regex engine matches much faster than a flat list of words
+    trie = {}
+    for word in words:
+        node = trie
+        for char in word:
+            node = node.setdefault(char, {})
+        node[""] = {}
+
+    def build(node):
+        if list(node) == [""]:
+            return ""
+        optional = "" in node
+        branches = [re.escape(char) + build(child) for char, child in sorted(node.items()) if char]
+        pattern = branches[0] if len(branches) == 1 else "(?:" + "|".join(branches) + ")"
+        if optional:
+            pattern = "(?:" + pattern + ")?"
+        return pattern
+
+    return build(trie)
+
+
+def _is_word_prefix(keyword, other):
+    # "world war" is a word prefix of "world war ii", but "war" is not one of "warsaw"
+    return (
+        other != keyword
+        and other.startswith(keyword)
+        and not (other[len(keyword)].isalnum() or other[len(keyword)] == "_")
+    )
+
+
+class KeywordMatcher:
+    """
+    Finds whole-word occurrences of many keywords in one pass.
+
+    Matches are case-insensitive (the text is lowercased once, so positions
+    refer to the original text) and also accept a plural "s"/"es" ending
+    ("fires" matches "fire"). Overlapping keywords are all reported: "ghost town"
+    reports both "ghost town" and "town", and "world war ii" also reports "world war".
+    """
+
+    def __init__(self, keywords):
+        self.keywords = list(dict.fromkeys(keywords))
+        self._by_lower = {k.lower(): k for k in self.keywords}
+        alternatives = list(self._by_lower)
+        # Lookahead so matches can overlap; a position is only tried at a word start.
+        # The trie is greedy, so the longest keyword starting at a position wins.
+        self._pattern = re.compile(r"\b(?=(" + _trie_pattern(alternatives) + r")(?:e?s)?\b)")
+        # Shorter keywords implied by a longer match at the same position
+        self._implied = {
+            k: [self._by_lower[o] for o in alternatives if _is_word_prefix(o, k)]
+            for k in alternatives
+        }
+
+    def finditer(self, text):
+        """
+        Yield (start, end, keyword) for every keyword occurrence, in text order.
+        """
+        for match in self._pattern.finditer(text.lower()):
+            found = match.group(1)
+            start = match.start()
+            yield start, start + len(found), self._by_lower[found]
+            for keyword in self._implied[found]:
+                yield start, start + len(keyword), keyword
+
+    def find_all(self, text):
+        """
+        Returns a list of (start, end, keyword) for every keyword occurrence.
+        """
+        return list(self.finditer(text))
+
+    def search(self, text):
+        """
+        Returns the first keyword that occurs in the text, or None.
+        """
+        match = self._pattern.search(text.lower())
+        if match is None:
+            return None
+        return self._by_lower[match.group(1)]
@@ -0,0 +1,152 @@
+"""
+Lightweight tracing and counters for a generation run.
+Spans time named stages and counters count events (API calls, cache hits,
+rate limits, timeouts). Both are written as JSON lines to a metrics file
+when the run ends. Until enable() is called, span(), traced() and count()
+do nothing beyond one flag check.
+"""
+
+import atexit
+import contextlib
+import functools
+import json
+import sys
+import threading
+import time
+from collections import Counter
+from datetime import datetime
+
+_enabled = False
+_path = None
+_lock = threading.Lock()
+_local = threading.local()
+_spans = []
+_counters = Counter()
+_started = 0.0
+_started_at = None
+
+_NULL_SPAN = contextlib.nullcontext()
+
+
+def enabled():
+    return _enabled
+
+
+def enable(path):
+    """
+    Start recording; the metrics file is written when the process exits.
+    """
+    global _enabled, _path, _started, _started_at
+    if _enabled:
+        return
+    _path = path
+    _started = time.perf_counter()
+    _started_at = datetime.now().isoformat(timespec="seconds")
+    _enabled = True
+    atexit.register(write)
+
+
+def count(name, value=1):
+    """
+    Add to a counter.
+    """
+    if not _enabled:
+        return
+    with _lock:
+        _counters[name] += value
+
+
+@contextlib.contextmanager
+def _span(name, attributes):
+    stack = getattr(_local, "stack", None)
+    if stack is None:
+        stack = _local.stack = []
+    record = {
+        "type": "span",
+        "name": name,
+        "parent": stack[-1] if stack else None,
+        "thread": threading.current_thread().name,
+        "start": round(time.perf_counter() - _started, 6)
+    }
+    record.update(attributes)
+    stack.append(name)
+    start = time.perf_counter()
+    try:
+        yield record
+    except BaseException as e:
+        record["error"] = type(e).__name__
+        raise
+    finally:
+        record["duration"] = round(time.perf_counter() - start, 6)
+        stack.pop()
+        with _lock:
+            _spans.append(record)
+
+
+def span(name, **attributes):
+    """
+    Context manager that times a block as a span.
+    The yielded record (None when disabled) can take extra attributes.
+    """
+    if not _enabled:
+        return _NULL_SPAN
+    return _span(name, attributes)
+
+
+def traced(name):
+    """
+    Decorator that records every call of a function as a span.
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not _enabled:
+                return func(*args, **kwargs)
+            with _span(name, {}):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def summary():
+    """
+    Returns (per span name: count/total/max seconds, counters).
+    """
+    with _lock:
+        totals = {}
+        for record in _spans:
+            entry = totals.setdefault(record["name"], {"count": 0, "total": 0.0, "max": 0.0})
+            entry["count"] += 1
+            entry["total"] += record["duration"]
+            entry["max"] = max(entry["max"], record["duration"])
+        return totals, dict(_counters)
+
+
+def write(path=None):
+    """
+    Write the run, its spans, per-span summaries and counters as JSON lines.
+    """
+    path = path or _path
+    if not _enabled or not path:
+        return
+    totals, counters = summary()
+    with _lock:
+        spans = list(_spans)
+    lines = [{
+        "type": "run",
+        "started": _started_at,
+        "duration": round(time.perf_counter() - _started, 6),
+        "argv": sys.argv[1:]
+    }]
+    lines.extend(spans)
+    for name, entry in sorted(totals.items()):
+        lines.append({"type": "summary", "name": name, "count": entry["count"],
+                      "total": round(entry["total"], 6), "max": round(entry["max"], 6)})
+    for name, value in sorted(counters.items()):
+        lines.append({"type": "counter", "name": name, "value": value})
+    try:
+        with open(path, "w", encoding="utf-8") as f:
+            for line in lines:
+                f.write(json.dumps(line, ensure_ascii=False) + "\n")
+    except OSError as e:
+        print(f"⚠️  Could not write metrics to {path}: {e}")
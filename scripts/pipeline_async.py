@@ -0,0 +1,212 @@
+"""
+Asyncio driver for post generation.
+Runs the same stages as generate_post.main() as coroutines: the blocking
+functions of generate_post run in one thread pool whose size matches the
+shared HTTP session's connection pool. Wikipedia articles of the likely
+places are fetched while trend scores are refreshed, the image searches of a
+post run concurrently, and every stage has its own timeout.
+
+A timed-out or cancelled stage stops being waited for and its result is
+discarded; a blocking call that already started finishes in its thread.
+"""
+
+import asyncio
+import functools
+from concurrent.futures import ThreadPoolExecutor
+
+import metrics
+from http_client import get_session
+
+# Seconds each stage may take (None: no limit)
+STAGE_TIMEOUTS = {
+    "refresh_trend_scores": 300.0,
+    "select_place_by_trend": 60.0,
+    "get_wikipedia_info": 120.0,
+    "search_images": 60.0,
+    "create_post": None,
+}
+
+# Wikipedia articles fetched ahead of the place being posted
+WIKI_PREFETCH = 3
+
+
+def parse_stage_timeouts(specs):
+    """
+    Parse ["stage=seconds", ...] into a dictionary of timeouts (0 means no limit).
+    Raises ValueError for unknown stages or invalid numbers.
+    """
+    timeouts = {}
+    for spec in specs or []:
+        stage, _, seconds = spec.partition("=")
+        stage = stage.strip()
+        if stage not in STAGE_TIMEOUTS:
+            raise ValueError(f"unknown stage {stage!r} (expected one of {', '.join(STAGE_TIMEOUTS)})")
+        value = float(seconds)
+        timeouts[stage] = value if value > 0 else None
+    return timeouts
+
+
+class AsyncPipeline:
+    """
+    Generates posts with the functions of the generate_post `module`.
+    """
+
+    def __init__(self, module, timeouts=None, workers=8, prefetch=WIKI_PREFETCH):
+        self.module = module
+        self.timeouts = dict(STAGE_TIMEOUTS)
+        self.timeouts.update(timeouts or {})
+        self.workers = workers
+        self.prefetch = prefetch
+        self._executor = None
+
+    async def stage(self, name, func, *args):
+        """
+        Run a blocking function in the pool with the timeout of stage `name`.
+        Raises asyncio.TimeoutError when the stage takes too long.
+        """
+        loop = asyncio.get_running_loop()
+        with metrics.span(f"async.{name}"):
+            future = loop.run_in_executor(self._executor, functools.partial(func, *args))
+            try:
+                return await asyncio.wait_for(future, self.timeouts.get(name))
+            except asyncio.TimeoutError:
+                metrics.count(f"stage_timeouts.{name}")
+                print(f"⚠️  {name} timed out after {self.timeouts.get(name):g}s")
+                raise
+
+    async def wikipedia(self, place):
+        try:
+            return await self.stage("get_wikipedia_info", self.module.wikipedia_info, place)
+        except asyncio.TimeoutError:
+            return {}
+
+    async def search(self, func, *args):
+        # A search that fails or times out has no results, like a failed API call
+        try:
+            return await self.stage("search_images", func, *args)
+        except asyncio.TimeoutError:
+            return []
+
+    async def create_post(self, place, wiki_info):
+        """
+        Plan a post, run its image searches concurrently and write it.
+        Returns the file path, or None if the post was skipped or timed out.
+        """
+        module = self.module
+        try:
+            plan = await self.stage("create_post", module.plan_post, place, wiki_info)
+        except asyncio.TimeoutError:
+            return None
+        if plan is None:
+            return None
+
+        saved = module.saved_post_images(place, plan)
+        if saved is not None:
+            images, event_candidates = saved
+        else:
+            print(f"Searching for current state images of '{place['name']}' using keywords: {plan['keywords']}")
+            queries, searches = module.plan_image_searches(place, plan['keywords'], plan['events'])
+            # Results are gathered in plan order so the post is the same as a serial run
+            results = await asyncio.gather(
+                *(self.search(module.search_images, search['query'], search['num']) for search in searches)
+            )
+            images, event_candidates = module.split_image_results(queries, searches, results)
+            module.save_post_images(place, plan, images, event_candidates)
+        try:
+            return await self.stage("create_post", module.write_post, plan, images, event_candidates)
+        except asyncio.TimeoutError:
+            return None
+
+    def likely_places(self, candidates):
+        """
+        The places most likely to be selected: the place selected earlier today,
+        the best stored trend scores, or the least recently posted places.
+        """
+        module = self.module
+        state = module.get_run_state()
+        if state is not None and state.selected():
+            # Resuming today's post
+            place = module.PLACES.find(state.selected())
+            if place is not None:
+                return [place]
+        ranked = [place for place, _, _ in module.stored_trend_order(candidates)]
+        if not ranked:
+            ranked = module.least_recently_posted(candidates)
+        return [place for place in ranked if not module.recently_posted(place)][:self.prefetch]
+
+    async def generate(self, candidates, choose=None):
+        """
+        Refresh trend scores, choose the places (`choose(candidates)`, default:
+        the place selected by trend score) and create their posts one at a time.
+        Returns a list of (place, post path or None).
+        """
+        module = self.module
+        refresh = asyncio.ensure_future(
+            self.stage("refresh_trend_scores", module.refresh_trend_scores, candidates)
+        )
+        # Start on the articles of the likely places while trends are scored. Places
+        # picked by `choose` are known as soon as it runs, so nothing is guessed then.
+        likely = self.likely_places(candidates) if choose is None else []
+        prefetched = {id(place): asyncio.ensure_future(self.wikipedia(place)) for place in likely}
+        results = []
+        try:
+            if not module.get_trend_store().latest(module.trend_anchor()):
+                # Nothing stored yet: the refresh decides the ranking
+                await asyncio.wait([refresh])
+
+            if choose is None:
+                choose = lambda places: [module.choose_place(places)]
+            try:
+                places = await self.stage("select_place_by_trend", choose, candidates)
+            except asyncio.TimeoutError:
+                places = module.least_recently_posted(candidates)[:1]
+
+            # Articles are fetched up to `prefetch` places ahead of the post being written
+            for place in places[:self.prefetch]:
+                if id(place) not in prefetched:
+                    prefetched[id(place)] = asyncio.ensure_future(self.wikipedia(place))
+            for k, place in enumerate(places):
+                ahead = places[k + self.prefetch] if k + self.prefetch < len(places) else None
+                if ahead is not None and id(ahead) not in prefetched:
+                    prefetched[id(ahead)] = asyncio.ensure_future(self.wikipedia(ahead))
+
+                print("\n" + "=" * 50)
+                print(f"[{k + 1}/{len(places)}] {place['name']}")
+                print("=" * 50)
+                wiki_info = await prefetched.pop(id(place))
+                module.print_wiki_summary(wiki_info)
+                post_path = await self.create_post(place, wiki_info)
+                results.append((place, post_path))
+                print(f"{'✅' if post_path else '❌'} {place['name']}")
+        finally:
+            # Articles of places that weren't chosen are no longer needed
+            for task in prefetched.values():
+                task.cancel()
+            await asyncio.gather(*prefetched.values(), return_exceptions=True)
+
+        try:
+            await refresh
+        except Exception as e:
+            print(f"⚠️  Trend score refresh failed: {type(e).__name__}: {e}")
+        return results
+
+    def run(self, candidates, choose=None, timeout=None):
+        """
+        Run generate() in a new event loop, cancelling it after `timeout` seconds.
+        """
+        # One pool of connections for every thread of the run
+        get_session(pool_size=self.workers)
+        self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="stage")
+        try:
+            return asyncio.run(asyncio.wait_for(self.generate(candidates, choose), timeout))
+        except asyncio.TimeoutError:
+            # Stage timeouts are handled where they happen; only a run timeout ends up here
+            if timeout is None:
+                raise
+            print(f"⚠️  Run cancelled after {timeout:g}s")
+            return []
+        finally:
+            # Stages that haven't started are dropped; running ones can't be interrupted
+            # and finish first
+            self._executor.shutdown(wait=True, cancel_futures=True)
+            self._executor = None
@@ -0,0 +1,177 @@
+"""
+Persistent index of the generated posts in _posts/.
+Only posts that are not indexed yet are parsed; new posts are added as they
+are written, so recency and duplicate checks don't rescan every post.
+"""
+
+import hashlib
+import json
+import os
+import re
+from pathlib import Path
+
+from cache import write_json
+from image_index import ImageIndex
+from lazy import LazyModule
+
+frontmatter = LazyModule("frontmatter")
+
+INDEX_VERSION = 2
+
+# Image links; mirrored images start with a Liquid tag ("{{ site.baseurl }}/images/...")
+_IMAGE_RE = re.compile(r"!\[[^\]]*\]\(\s*([^)]+?)\s*\)")
+_EVENT_HEADING_RE = re.compile(r"^### \d+\. (.+)$", re.MULTILINE)
+_FILENAME_DATE_RE = re.compile(r"^(\d{4}-\d{2}-\d{2})-")
+
+
+def event_hash(text):
+    """
+    Short hash of an event description, ignoring case and whitespace.
+    """
+    normalized = " ".join(text.lower().split())
+    return hashlib.sha1(normalized.encode("utf-8")).hexdigest()[:16]
+
+
+def place_key(name):
+    return " ".join(name.lower().split())
+
+
+def parse_post(path):
+    """
+    Read one post file into an index record.
+    """
+    post = frontmatter.load(str(path))
+    tags = [str(tag) for tag in post.metadata.get("tags", [])]
+    title = str(post.metadata.get("title", ""))
+    place = tags[0] if tags else title.replace("The Current State of ", "")
+
+    date_match = _FILENAME_DATE_RE.match(path.name)
+    date = date_match.group(1) if date_match else str(post.metadata.get("date", ""))[:10]
+
+    return {
+        "file": path.name,
+        "size": path.stat().st_size,
+        "place": place,
+        "date": date,
+        "tags": tags,
+        "images": _IMAGE_RE.findall(post.content),
+        "events": [event_hash(event) for event in _EVENT_HEADING_RE.findall(post.content)]
+    }
+
+
+class PostIndex:
+    """
+    Index of posts with lookups by file name, place, event and image URL.
+    """
+
+    def __init__(self, path, posts_dir):
+        self.path = Path(path)
+        self.posts_dir = Path(posts_dir)
+        self.posts = {}
+        self._last_posted = {}
+        self._events = {}
+        self.images = ImageIndex()
+
+    @classmethod
+    def load(cls, path, posts_dir):
+        """
+        Load the index from disk and bring it up to date with the posts directory.
+        """
+        index = cls(path, posts_dir)
+        try:
+            data = json.loads(index.path.read_text(encoding="utf-8"))
+            if data.get("version") == INDEX_VERSION:
+                index.posts = data.get("posts", {})
+        except (OSError, ValueError):
+            pass
+        if index.refresh() or not index.path.exists():
+            index.save()
+        return index
+
+    def refresh(self):
+        """
+        Parse posts that are new or changed since they were indexed and drop deleted ones.
+        Returns True if the index changed.
+        """
+        changed = False
+        on_disk = {}
+        if self.posts_dir.is_dir():
+            with os.scandir(self.posts_dir) as entries:
+                for entry in entries:
+                    if entry.is_file() and entry.name.endswith(".md"):
+                        on_disk[entry.name] = entry.stat().st_size
+
+        for name in list(self.posts):
+            if name not in on_disk:
+                del self.posts[name]
+                changed = True
+
+        for name, size in on_disk.items():
+            record = self.posts.get(name)
+            if record is None or record.get("size") != size:
+                try:
+                    self.posts[name] = parse_post(self.posts_dir / name)
+                except Exception as e:
+                    print(f"  ⚠️  Could not index {name}: {type(e).__name__}")
+                    continue
+                changed = True
+
+        self._rebuild_lookups()
+        return changed
+
+    def _rebuild_lookups(self):
+        self._last_posted = {}
+        self._events = {}
+        self.images = ImageIndex()
+        for record in self.posts.values():
+            self._add_lookups(record)
+
+    def _add_lookups(self, record):
+        key = place_key(record["place"])
+        if record["date"] > self._last_posted.get(key, ""):
+            self._last_posted[key] = record["date"]
+        for digest in record["events"]:
+            self._events.setdefault(key, set()).add(digest)
+        phashes = record.get("phashes", {})
+        for url in record["images"]:
+            self.images.add(url, record["file"], phashes.get(url))
+
+    def add(self, path, phashes=None):
+        """
+        Index a post that was just written and save the index.
+        `phashes` optionally maps the post's image URLs to perceptual hashes.
+        """
+        path = Path(path)
+        record = parse_post(path)
+        if phashes:
+            record["phashes"] = {url: h for url, h in phashes.items() if url in record["images"]}
+        self.posts[path.name] = record
+        self._add_lookups(record)
+        self.save()
+        return record
+
+    def save(self):
+        data = {"version": INDEX_VERSION, "posts": self.posts}
+        write_json(self.path, data, sort_keys=True)
+
+    def has_post(self, filename):
+        return filename in self.posts
+
+    def last_posted(self, place_name):
+        """
+        Returns the date (YYYY-MM-DD) of the latest post about a place, or None.
+        """
+        return self._last_posted.get(place_key(place_name))
+
+    def has_event(self, place_name, description):
+        """
+        Returns True if an event with this description was already posted for the place.
+        """
+        return event_hash(description) in self._events.get(place_key(place_name), ())
+
+    def image_post(self, url, phash=None):
+        """
+        Returns the file name of the first post that used an image (matched by
+        normalized URL or perceptual hash), or None.
+        """
+        return self.images.find(url, phash)
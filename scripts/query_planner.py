@@ -0,0 +1,112 @@
+"""
+Planning of the image searches of a post.
+Every search costs one unit of the daily Custom Search quota, whether it asks
+for 1 or 10 results. Queries are normalized and duplicates are searched once;
+queries that share most of the words that set them apart from the other
+queries of the post (not just the place name) are coalesced into one search
+for up to 10 results, which are then ranked for each query by how well their title
+and page match the words that made that query different. Images used twice
+within a post are filtered out later, so merged queries can share results.
+"""
+
+import re
+
+# Most results one Custom Search request returns
+MAX_RESULTS = 10
+
+# Queries whose own words overlap at least this much (Jaccard index) share a search
+MERGE_THRESHOLD = 0.5
+
+_WORD_RE = re.compile(r"\w+")
+
+
+def query_words(query):
+    """
+    The distinct lowercase words of a query, in order.
+    """
+    return tuple(dict.fromkeys(_WORD_RE.findall(query.lower())))
+
+
+def overlap(a, b):
+    """
+    Jaccard index of two word tuples.
+    """
+    a, b = set(a), set(b)
+    if not a and not b:
+        return 1.0
+    return len(a & b) / len(a | b)
+
+
+def plan_searches(queries, threshold=MERGE_THRESHOLD, max_results=MAX_RESULTS):
+    """
+    Group (query, number of results) requests into searches.
+    Returns a list of {"query", "num", "members"} where members are the indexes
+    of the requests the search answers. A search with one distinct query keeps
+    its text; coalesced searches use the words their queries have in common.
+    """
+    all_words = [query_words(query) for query, _ in queries]
+    # Words in every query (the place and location) don't make queries similar
+    shared = set.intersection(*map(set, all_words)) if len(all_words) > 1 else set()
+    groups = []
+    for i, (query, num) in enumerate(queries):
+        words = all_words[i]
+        own = tuple(w for w in words if w not in shared)
+        for group in groups:
+            nums = group["nums"]
+            if words in nums:
+                # Duplicates always share a search
+                nums[words] = max(nums[words], num)
+            elif own and overlap(own, group["own"]) >= threshold and len(nums) < max_results:
+                nums[words] = num
+                group["common"] = tuple(w for w in group["common"] if w in words)
+            else:
+                continue
+            group["members"].append(i)
+            break
+        else:
+            groups.append({"seed": words, "own": own, "common": words, "query": query,
+                           "members": [i], "nums": {words: num}})
+
+    searches = []
+    for group in groups:
+        if len(group["nums"]) == 1:
+            # Only duplicates: the same search as before
+            searches.append({"query": group["query"], "num": group["nums"][group["seed"]],
+                             "members": group["members"]})
+        else:
+            searches.append({"query": " ".join(group["common"]), "num": max_results,
+                             "members": group["members"]})
+    return searches
+
+
+def _relevance(result, words):
+    text = " ".join((result.get("title", ""), result.get("context", ""), result.get("url", ""))).lower()
+    found = set(_WORD_RE.findall(text))
+    return sum(1 for word in words if word in found)
+
+
+def distribute(queries, searches, results):
+    """
+    Split the results of planned searches back into one list per request,
+    ordered by relevance to the request (API order breaks ties) and cut to the
+    number of results it asked for.
+    """
+    per_request = [[] for _ in queries]
+    for search, found in zip(searches, results):
+        search_words = set(query_words(search["query"]))
+        for i in search["members"]:
+            query, num = queries[i]
+            # Words of this request that the coalesced search left out
+            extra = [w for w in query_words(query) if w not in search_words]
+            ranked = found
+            if extra:
+                ranked = sorted(found, key=lambda result: -_relevance(result, extra))
+            per_request[i] = list(ranked[:num])
+    return per_request
+
+
+def quota_saved(queries, searches):
+    """
+    Number of search requests saved by the plan.
+    """
+    return len(queries) - len(searches)
@@ -0,0 +1,185 @@
+"""
+Rate limiting helpers shared by the post generation script.
+"""
+
+import random
+import threading
+import time
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket.
+    Allows bursts of up to `capacity` calls and refills at `rate` tokens per second.
+    """
+
+    def __init__(self, rate, capacity=1):
+        self.rate = float(rate)
+        self.capacity = float(capacity)
+        self._tokens = float(capacity)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def try_acquire(self, tokens=1):
+        """
+        Take tokens without waiting.
+        Returns True if the tokens were available.
+        """
+        with self._lock:
+            self._refill()
+            if self._tokens >= tokens:
+                self._tokens -= tokens
+                return True
+            return False
+
+    def acquire(self, tokens=1):
+        """
+        Block until the requested tokens are available, then take them.
+        """
+        while True:
+            with self._lock:
+                self._refill()
+                if self._tokens >= tokens:
+                    self._tokens -= tokens
+                    return
+                # Time until enough tokens have been refilled
+                wait = (tokens - self._tokens) / self.rate
+            time.sleep(wait)
+
+
+class CircuitOpenError(Exception):
+    """
+    Raised instead of calling an endpoint that failed too often in a row.
+    """
+
+
+def parse_retry_after(value):
+    """
+    Seconds to wait from a Retry-After header (seconds or an HTTP date), or None.
+    """
+    if not value:
+        return None
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+    try:
+        when = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max(0.0, (when - datetime.now(timezone.utc)).total_seconds())
+
+
+class AdaptiveLimiter:
+    """
+    Rate limiter for one endpoint, shared by every thread that calls it.
+
+    Requests are paced by a token bucket. A rate-limited response halves the
+    rate (down to `min_rate`) and successes raise it again step by step.
+    After a failure all callers wait for the Retry-After time or a jittered
+    exponential backoff. After `failure_threshold` consecutive failures the
+    circuit opens and calls fail fast for `cooldown` seconds; the first call
+    after that is a trial that closes it again on success.
+    """
+
+    def __init__(self, name, rate, burst=1, min_rate=None, max_retries=3,
+                 backoff_base=1.0, backoff_cap=60.0, failure_threshold=5, cooldown=60.0):
+        self.name = name
+        self.max_rate = float(rate)
+        self.min_rate = float(min_rate) if min_rate is not None else self.max_rate / 8
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_cap = backoff_cap
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self.bucket = TokenBucket(rate, burst)
+        self._failures = 0
+        self._blocked_until = 0.0
+        self._open_until = 0.0
+        self._lock = threading.Lock()
+
+    @property
+    def rate(self):
+        return self.bucket.rate
+
+    def backoff(self, failures):
+        """
+        Full-jitter exponential backoff for the given number of consecutive failures.
+        """
+        return random.uniform(0, min(self.backoff_cap, self.backoff_base * 2 ** (failures - 1)))
+
+    def acquire(self):
+        """
+        Wait until a request may be sent.
+        Raises CircuitOpenError while the circuit is open.
+        """
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                if now < self._open_until:
+                    raise CircuitOpenError(f"{self.name}: too many failures, paused for "
+                                           f"{self._open_until - now:.0f}s")
+                wait = self._blocked_until - now
+            if wait <= 0:
+                break
+            time.sleep(wait)
+        self.bucket.acquire()
+
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            # Additive increase back towards the configured rate
+            self.bucket.rate = min(self.max_rate, self.bucket.rate + self.max_rate / 10)
+
+    def record_failure(self, retry_after=None, rate_limited=False):
+        """
+        Record a failed request and hold back all callers.
+        Returns the number of seconds callers wait before the next request.
+        """
+        with self._lock:
+            self._failures += 1
+            if rate_limited:
+                # Multiplicative decrease
+                self.bucket.rate = max(self.min_rate, self.bucket.rate / 2)
+            delay = retry_after if retry_after is not None else self.backoff(self._failures)
+            now = time.monotonic()
+            if delay > self.backoff_cap:
+                # Asked to wait longer than retrying is worth: stop calling until then
+                self._open_until = max(self._open_until, now + delay)
+                return delay
+            self._blocked_until = max(self._blocked_until, now + delay)
+            if self._failures >= self.failure_threshold:
+                self._open_until = now + self.cooldown
+            return delay
+
+
+_limiters = {}
+_limiters_lock = threading.Lock()
+
+
+def configure_limiter(name, rate, burst=1, **settings):
+    """
+    Create (or replace) the shared limiter of an endpoint.
+    """
+    limiter = AdaptiveLimiter(name, rate, burst, **settings)
+    with _limiters_lock:
+        _limiters[name] = limiter
+    return limiter
+
+
+def get_limiter(name):
+    """
+    Return the shared limiter of an endpoint, creating a default one (1 request
+    per second) if it wasn't configured.
+    """
+    with _limiters_lock:
+        limiter = _limiters.get(name)
+        if limiter is None:
+            limiter = _limiters[name] = AdaptiveLimiter(name, 1.0)
+        return limiter
@@ -0,0 +1,191 @@
+"""
+Markdown rendering of posts.
+A post is first assembled into a dictionary of its content; the layout lives
+in section templates that are compiled once per process and written into one
+list of parts, so the same content always renders to the same bytes.
+"""
+
+import functools
+import re
+
+from lazy import LazyModule
+
+yaml = LazyModule("yaml")
+
+_FIELD_RE = re.compile(r"\{(\w+)\}")
+
+# Layout of a post, one template per section
+SECTION_TEMPLATES = {
+    "head": "# The Current State of {name}{location_text}\n\n{description}\n\n",
+    "events": "\n## Historical Events\n\n",
+    "event": "### {number}. {description}\n\n",
+    "event_image": "![{name} historical event {number}]({url})\n\n*{title}*\n\n",
+    "event_no_image": "*이미지를 찾을 수 없습니다.*\n\n",
+    "background": (
+        "\n## Historical Background\n\n"
+        "{name} has a rich history marked by significant events that shaped its current state. "
+        "From its founding to its decline, this place has witnessed many historical moments "
+        "that reflect the changes of time.\n\n"
+    ),
+    "between": "\n\n",
+    "images": "\n\n## Current State\n\n",
+    "image": "![{name} image {number}]({url})\n\n*{title}*\n\n",
+    "foot": (
+        "\n\n## Conclusion\n\n"
+        "We've explored the current state of {name}, a place that was once popular and thriving. "
+        "While places change with the passage of time, the memories and stories remain.\n"
+    ),
+}
+
+
+class Template:
+    """
+    A template with {field} placeholders, split into literal and field parts once.
+    """
+
+    __slots__ = ("source", "parts")
+
+    def __init__(self, source):
+        self.source = source
+        parts = []
+        position = 0
+        for match in _FIELD_RE.finditer(source):
+            if match.start() > position:
+                parts.append((False, source[position:match.start()]))
+            parts.append((True, match.group(1)))
+            position = match.end()
+        if position < len(source):
+            parts.append((False, source[position:]))
+        self.parts = tuple(parts)
+
+    def render_into(self, out, values):
+        """
+        Append the rendered parts to the list `out`.
+        """
+        for is_field, text in self.parts:
+            out.append(str(values[text]) if is_field else text)
+
+    def render(self, values):
+        out = []
+        self.render_into(out, values)
+        return "".join(out)
+
+
+@functools.lru_cache(maxsize=None)
+def compile_template(source):
+    """
+    Returns the compiled template for a source string (cached per process).
+    """
+    return Template(source)
+
+
+def section(name):
+    return compile_template(SECTION_TEMPLATES[name])
+
+
+# Strings that YAML writes unquoted, unless they resolve to another type
+_PLAIN_RE = re.compile(r"[A-Za-z][A-Za-z0-9 ,.()'-]*[A-Za-z0-9.)]\Z")
+_QUOTED_RE = re.compile(r"[0-9][0-9 :.-]*\Z")
+# Longer lines may be folded by the dumper
+_MAX_LINE = 70
+
+
+@functools.lru_cache(maxsize=4096)
+def _scalar(value):
+    """
+    Returns how YAML writes a string, or None if it is not a simple case.
+    """
+    if _PLAIN_RE.match(value) and "  " not in value:
+        quoted = False
+    elif _QUOTED_RE.match(value):
+        quoted = True
+    else:
+        return None
+    # Strings that would read back as booleans, numbers, dates or null are quoted
+    tag = yaml.resolver.Resolver().resolve(yaml.ScalarNode, value, (True, False))
+    if (tag != "tag:yaml.org,2002:str") != quoted:
+        return None
+    return f"'{value}'" if quoted else value
+
+
+def _fast_front_matter(metadata):
+    # Flat mappings of strings and lists of strings, written without the dumper
+    lines = []
+    for key in sorted(metadata):
+        value = metadata[key]
+        if not isinstance(key, str) or _scalar(key) != key:
+            return None
+        if isinstance(value, str):
+            text = _scalar(value)
+            if text is None or len(key) + len(text) + 2 > _MAX_LINE:
+                return None
+            lines.append(f"{key}: {text}")
+        elif isinstance(value, list) and value and all(isinstance(item, str) for item in value):
+            lines.append(f"{key}:")
+            for item in value:
+                text = _scalar(item)
+                if text is None or len(text) + 2 > _MAX_LINE:
+                    return None
+                lines.append(f"- {text}")
+        else:
+            return None
+    return "\n".join(lines)
+
+
+def render_front_matter(metadata):
+    """
+    YAML front matter, formatted like python-frontmatter's default YAML handler
+    (which also prefers the C dumper). Simple metadata is written directly.
+    """
+    fast = _fast_front_matter(metadata)
+    if fast is not None:
+        return fast
+    dumper = getattr(yaml, "CSafeDumper", None) or yaml.SafeDumper
+    return yaml.dump(metadata, Dumper=dumper, default_flow_style=False, allow_unicode=True).strip()
+
+
+def render_post(post):
+    """
+    Render a post to the text of its Markdown file.
+
+    `post` is a dictionary with `name`, `location`, `description`, `events`
+    (a list of (description, image or None)), `images` (current state images)
+    and `metadata` (front matter). Images are dictionaries with `url` and `title`.
+    """
+    name = post["name"]
+    location = post.get("location", "")
+    out = ["---\n", render_front_matter(post["metadata"]), "\n---\n\n"]
+
+    section("head").render_into(out, {
+        "name": name,
+        "location_text": f" ({location})" if location else "",
+        "description": post.get("description", "")
+    })
+
+    events = post.get("events", [])
+    if events:
+        section("events").render_into(out, {})
+        for number, (description, image) in enumerate(events, 1):
+            section("event").render_into(out, {"number": number, "description": description})
+            if image:
+                section("event_image").render_into(out, {
+                    "name": name, "number": number, "url": image["url"], "title": image["title"]
+                })
+            else:
+                section("event_no_image").render_into(out, {})
+    else:
+        section("background").render_into(out, {"name": name})
+
+    section("between").render_into(out, {})
+
+    images = post.get("images", [])
+    if images:
+        section("images").render_into(out, {})
+        for number, image in enumerate(images, 1):
+            section("image").render_into(out, {
+                "name": name, "number": number, "url": image["url"], "title": image["title"]
+            })
+
+    section("foot").render_into(out, {"name": name})
+    # The file has no trailing whitespace
+    return "".join(out).rstrip()
@@ -0,0 +1,291 @@
+"""
+Record and replay of external API responses.
+In record mode the wrapped functions of generate_post run normally and their
+results are saved to fixture files; in replay mode the results are read back,
+so a run makes no network calls. A local stand-in server answers Custom Search
+and Wikipedia revision requests from the same fixtures.
+"""
+
+import functools
+import hashlib
+import inspect
+import json
+import threading
+import time
+import zlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import parse_qs, urlsplit
+
+from cache import write_json
+
+# Recorded functions of generate_post and the result each returns when its call fails
+TARGETS = {
+    "search_images": [],
+    "get_wikipedia_info": {"summary": "", "keywords": [], "full_text": "", "historical_events": []},
+    "TrendScorer.fetch_batch": None,
+}
+
+RECORD = "record"
+REPLAY = "replay"
+
+_MISSING = object()
+
+
+def call_key(func, args, kwargs):
+    """
+    Key of a call: its arguments bound to parameter names, with defaults applied.
+    """
+    bound = inspect.signature(func).bind(*args, **kwargs)
+    bound.apply_defaults()
+    arguments = {name: value for name, value in bound.arguments.items() if name != "self"}
+    return json.dumps(arguments, sort_keys=True, ensure_ascii=False)
+
+
+class Fixtures:
+    """
+    Recorded results, one JSON file per function in `directory`.
+    Without a directory the fixtures are only kept in memory.
+    """
+
+    def __init__(self, directory=None):
+        self.directory = Path(directory) if directory is not None else None
+        self._tables = {}
+        self._lock = threading.Lock()
+
+    def _path(self, name):
+        return self.directory / f"{name}.json"
+
+    def _table(self, name):
+        table = self._tables.get(name)
+        if table is None:
+            table = {}
+            if self.directory is not None:
+                try:
+                    table = json.loads(self._path(name).read_text(encoding="utf-8"))
+                except (OSError, ValueError):
+                    pass
+            self._tables[name] = table
+        return table
+
+    def get(self, name, key, default=None):
+        with self._lock:
+            return self._table(name).get(key, default)
+
+    def put(self, name, key, value):
+        """
+        Store a result and write the function's fixture file.
+        """
+        with self._lock:
+            table = self._table(name)
+            table[key] = value
+            if self.directory is not None:
+                write_json(self._path(name), table, sort_keys=True, indent=1)
+
+    def items(self, name):
+        with self._lock:
+            return list(self._table(name).items())
+
+
+class Replay:
+    """
+    Wraps the TARGETS functions of a module to record or replay their results.
+    In replay mode a call that wasn't recorded returns the function's failure
+    result (as if the API was unreachable), or raises KeyError if `strict`.
+    """
+
+    def __init__(self, module, mode, fixtures, targets=None, strict=False):
+        if mode not in (RECORD, REPLAY):
+            raise ValueError(f"Unknown replay mode: {mode}")
+        self.module = module
+        self.mode = mode
+        self.fixtures = fixtures
+        self.targets = list(targets) if targets is not None else list(TARGETS)
+        self.strict = strict
+        self._originals = []
+
+    def _owner(self, target):
+        owner = self.module
+        *path, attribute = target.split(".")
+        for name in path:
+            owner = getattr(owner, name)
+        return owner, attribute
+
+    def _wrap(self, target, func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            key = call_key(func, args, kwargs)
+            if self.mode == REPLAY:
+                value = self.fixtures.get(target, key, _MISSING)
+                if value is not _MISSING:
+                    return value
+                if self.strict:
+                    raise KeyError(f"No recorded {target} result for {key}")
+                return json.loads(json.dumps(TARGETS.get(target)))
+            value = func(*args, **kwargs)
+            self.fixtures.put(target, key, value)
+            return value
+        return wrapper
+
+    def install(self):
+        for target in self.targets:
+            owner, attribute = self._owner(target)
+            func = getattr(owner, attribute)
+            self._originals.append((owner, attribute, func))
+            setattr(owner, attribute, self._wrap(target, func))
+        return self
+
+    def uninstall(self):
+        while self._originals:
+            owner, attribute, func = self._originals.pop()
+            setattr(owner, attribute, func)
+
+    def __enter__(self):
+        return self.install()
+
+    def __exit__(self, *exc_info):
+        self.uninstall()
+
+
+def _stable_int(text):
+    return zlib.crc32(text.encode("utf-8"))
+
+
+def synthetic_images(query, num):
+    """
+    Deterministic image results for a query that wasn't recorded.
+    """
+    digest = hashlib.sha1(query.encode("utf-8")).hexdigest()[:12]
+    return [
+        {
+            "url": f"https://images.example.org/{digest}/{i}.jpg",
+            "title": f"{query} ({i + 1})",
+            "thumbnail": f"https://images.example.org/{digest}/{i}-thumb.jpg",
+            "context": f"https://example.org/{digest}/{i}"
+        }
+        for i in range(num)
+    ]
+
+
+class _StandInHandler(BaseHTTPRequestHandler):
+    server_version = "StandIn/1.0"
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        parts = urlsplit(self.path)
+        params = {k: v[0] for k, v in parse_qs(parts.query).items()}
+        if self.server.latency:
+            time.sleep(self.server.latency)
+
+        if parts.path == "/customsearch/v1":
+            body = self.server.stand_in.search_response(params)
+        elif parts.path == "/w/api.php":
+            body = self.server.stand_in.revision_response(params)
+        else:
+            self.send_error(404)
+            return
+
+        data = json.dumps(body).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+
+class StandInServer:
+    """
+    Local HTTP server standing in for the Custom Search and Wikipedia APIs.
+    Recorded search_images results are served as Custom Search items; other
+    queries get deterministic synthetic images. `latency` (seconds) is added
+    to every response.
+    """
+
+    def __init__(self, fixtures=None, host="127.0.0.1", port=0, latency=0.0):
+        self.fixtures = fixtures if fixtures is not None else Fixtures()
+        self._server = ThreadingHTTPServer((host, port), _StandInHandler)
+        self._server.daemon_threads = True
+        self._server.stand_in = self
+        self._server.latency = latency
+        self._thread = None
+        self.requests = 0
+
+    @property
+    def url(self):
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    @property
+    def search_url(self):
+        return self.url + "/customsearch/v1"
+
+    @property
+    def wikipedia_api_url(self):
+        return self.url + "/w/api.php"
+
+    def search_response(self, params):
+        self.requests += 1
+        query = params.get("q", "")
+        num = int(params.get("num", 10))
+        key = json.dumps({"date_restrict": params.get("dateRestrict"), "num_results": num, "query": query},
+                         sort_keys=True, ensure_ascii=False)
+        images = self.fixtures.get("search_images", key)
+        if images is None:
+            images = synthetic_images(query, num)
+        return {
+            "items": [
+                {
+                    "link": image["url"],
+                    "title": image["title"],
+                    "image": {"thumbnailLink": image["thumbnail"], "contextLink": image["context"]}
+                }
+                for image in images
+            ]
+        }
+
+    def revision_response(self, params):
+        self.requests += 1
+        title = params.get("titles", "")
+        return {"query": {"pages": {str(_stable_int(title)): {"title": title, "lastrevid": _stable_int(title)}}}}
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+        if self._thread is not None:
+            self._thread.join()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+
+def main(argv=None):
+    import argparse
+    parser = argparse.ArgumentParser(description="Serve recorded fixtures as a stand-in for the search APIs.")
+    parser.add_argument("--fixtures", help="directory of recorded fixtures")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--latency", type=float, default=0.0, help="added latency per request, in milliseconds")
+    args = parser.parse_args(argv)
+
+    server = StandInServer(Fixtures(args.fixtures), port=args.port, latency=args.latency / 1000)
+    print(f"CUSTOM_SEARCH_URL={server.search_url}")
+    print(f"WIKIPEDIA_API_URL={server.wikipedia_api_url}")
+    try:
+        server._server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server._server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+"""
+Checkpoints of the current generation run.
+Each stage of a post (Wikipedia info, image search results, rendered
+Markdown) is saved to a small JSON file per date and place as soon as it
+completes, so a run that fails or is interrupted resumes from the last
+completed stage instead of spending API calls again. The place selected for
+the day is kept too. Checkpoints of earlier days are removed.
+"""
+
+import json
+import shutil
+import threading
+from datetime import datetime, timedelta
+from pathlib import Path
+
+from cache import write_json
+from catalog import make_slug
+
+# File of run-level checkpoints (the selected place); place files are named by slug
+RUN_FILE = "_run.json"
+
+
+class RunState:
+    """
+    Checkpoints in `directory`/<date>/<place slug>.json.
+    """
+
+    def __init__(self, directory, date=None, keep_days=1):
+        self.directory = Path(directory)
+        self.date = date or datetime.now().strftime("%Y-%m-%d")
+        self.keep_days = keep_days
+        self._lock = threading.Lock()
+        # Contents of the checkpoint files read or written by this process
+        self._files = {}
+
+    @property
+    def path(self):
+        return self.directory / self.date
+
+    def _file(self, place):
+        return self.path / (RUN_FILE if place is None else make_slug(place['name']) + ".json")
+
+    def _read(self, path):
+        if path not in self._files:
+            try:
+                self._files[path] = json.loads(path.read_text(encoding="utf-8"))
+            except (OSError, ValueError):
+                self._files[path] = {}
+        return self._files[path]
+
+    def get(self, place, stage):
+        """
+        Returns the checkpoint of a stage for a place (None: the whole run), or None.
+        """
+        with self._lock:
+            return self._read(self._file(place)).get(stage)
+
+    def put(self, place, stage, value):
+        """
+        Save the checkpoint of a stage.
+        """
+        with self._lock:
+            path = self._file(place)
+            data = self._read(path)
+            data[stage] = value
+            write_json(path, data)
+
+    def selected(self):
+        """
+        Returns the name of the place selected earlier today, or None.
+        """
+        return self.get(None, "selected")
+
+    def select(self, place):
+        self.put(None, "selected", place['name'])
+
+    def complete(self, place):
+        """
+        Drop the checkpoints of a place whose post was written.
+        """
+        with self._lock:
+            paths = [self._file(place)]
+            if self._read(self._file(None)).get("selected") == place['name']:
+                paths.append(self._file(None))
+            for path in paths:
+                self._files.pop(path, None)
+                try:
+                    path.unlink()
+                except FileNotFoundError:
+                    pass
+
+    def collect_garbage(self, now=None):
+        """
+        Remove the checkpoints of days more than `keep_days` ago.
+        Returns the number of days removed.
+        """
+        now = now or datetime.now()
+        cutoff = (now - timedelta(days=self.keep_days)).strftime("%Y-%m-%d")
+        removed = 0
+        if not self.directory.is_dir():
+            return 0
+        for entry in self.directory.iterdir():
+            # Day directories are named YYYY-MM-DD, which sorts by date
+            if entry.is_dir() and entry.name < cutoff and entry.name != self.date:
+                shutil.rmtree(entry, ignore_errors=True)
+                removed += 1
+        return removed
@@ -0,0 +1,125 @@
+"""
+Streaming sentence segmentation for article text.
+Sentences are produced lazily, so callers can stop early without the whole
+text ever being split into a list.
+"""
+
+import re
+
+# Words that end with a period without ending the sentence
+ABBREVIATIONS = {
+    "mr", "mrs", "ms", "dr", "prof", "sr", "jr", "st", "mt", "ft", "ave", "blvd",
+    "gen", "col", "lt", "capt", "sgt", "gov", "sen", "rep", "pres", "rev", "hon",
+    "inc", "co", "corp", "ltd", "bros", "no", "nos", "vol", "pp", "ed", "est",
+    "approx", "ca", "c", "cf", "vs", "etc", "al", "fig",
+    "jan", "feb", "mar", "apr", "jun", "jul", "aug", "sep", "sept", "oct", "nov", "dec",
+}
+
+
+def _not_after_abbreviation():
+    # Lookbehinds must have a fixed width, so use one per abbreviation length
+    by_length = {}
+    for word in ABBREVIATIONS:
+        by_length.setdefault(len(word), []).append(re.escape(word))
+    # Checked right after the period, so they only run at candidate positions
+    lookbehinds = [
+        r"(?<!\b(?i:" + "|".join(sorted(words)) + r")\.)"
+        for _, words in sorted(by_length.items())
+    ]
+    # Dotted abbreviations ("U.S.", "e.g.") and single lowercase letters.
+    # Single capital letters are left to _is_initial.
+    lookbehinds.append(r"(?<!\.[A-Za-z]\.)(?<!\b[a-z]\.)")
+    return "".join(lookbehinds)
+
+
+# Words after which a single capital letter is a label, not an initial ("Plan B.")
+LETTER_LABELS = {
+    "plan", "type", "class", "group", "grade", "model", "section", "part", "phase",
+    "route", "line", "unit", "block", "building", "gate", "vitamin",
+}
+
+# Capital letters that are also roman numerals ("World War I.", "Henry V.")
+ROMAN_NUMERALS = set("IVX")
+
+# The word before a single letter, and what follows its period
+_WORD_BEFORE_RE = re.compile(r"(\S+)[ \t]+$")
+_CAPITALIZED_NEXT_RE = re.compile(r"\s+(?:[A-Z]\.|[A-Z])")
+
+
+def _is_initial(text, period):
+    # Whether the single capital letter before the period at `period` is an initial
+    # ("Coleman A. Young", "J. R. R. Tolkien") rather than a sentence end ("World War I.")
+    letter = text[period - 1]
+    if not "A" <= letter <= "Z" or (period >= 2 and (text[period - 2].isalnum() or text[period - 2] == "_")):
+        return False
+    following = _CAPITALIZED_NEXT_RE.match(text, period + 1)
+    if following is None:
+        return False
+    if following.group().endswith("."):
+        # More initials follow
+        return True
+    before = _WORD_BEFORE_RE.search(text, max(0, period - 41), period - 1)
+    if before is None or before.group(1)[-1] in ".!?\"')]":
+        # Last of a run of initials, or an initial starting a sentence
+        return True
+    if letter in ROMAN_NUMERALS or before.group(1).lower() in LETTER_LABELS:
+        return False
+    # A middle initial between capitalized names
+    return before.group(1)[0].isupper()
+
+
+# Sentence ends: terminal punctuation (plus closing quotes or brackets) followed
+# by whitespace, or a line break. A single period after an abbreviation is not an
+# end. A period inside a number ("1.85") is never followed by whitespace.
+# The leading lookahead lets the regex engine skip quickly to candidate characters.
+_BOUNDARY_RE = re.compile(
+    r"(?=[.!?\n])(?:(?:[!?][.!?]*|\.(?:[.!?]+|" + _not_after_abbreviation() + r"))[\"')\]]*(?=\s|$)|\n+)"
+)
+
+
+def _iter_segments(text):
+    # Sentences and section headings, in text order
+    start = 0
+    for boundary in _BOUNDARY_RE.finditer(text):
+        mark = boundary.group()
+        if mark == "." and _is_initial(text, boundary.start()):
+            continue
+        # Keep closing quotes and brackets, drop the punctuation itself
+        segment = (text[start:boundary.start()] + mark.lstrip(".!?").strip()).strip()
+        start = boundary.end()
+        if segment:
+            yield segment
+
+    segment = text[start:].strip()
+    if segment:
+        yield segment
+
+
+def _is_heading(segment):
+    # Wikipedia plain text marks headings as "== History ==", "=== Decline ===", ...
+    return segment.startswith("==") and segment.endswith("==")
+
+
+def iter_sentences(text):
+    """
+    Yield the sentences of a text one at a time, stripped and without their
+    terminal punctuation. Abbreviations, initials and decimal numbers do not
+    end a sentence; line breaks (paragraphs and section headings) always do.
+    Section headings themselves are skipped.
+    """
+    for segment in _iter_segments(text):
+        if not _is_heading(segment):
+            yield segment
+
+
+def iter_section_sentences(text):
+    """
+    Like iter_sentences, but yield (section title, sentence) pairs.
+    The section title is lowercased; it is "" for the article's lead section.
+    """
+    section = ""
+    for segment in _iter_segments(text):
+        if _is_heading(segment):
+            section = segment.strip("= ").lower()
+        else:
+            yield section, segment
@@ -0,0 +1,171 @@
+#!/usr/bin/env python3
+"""
+Manifest of the files the generator publishes (posts and mirrored images).
+Every file is listed with its SHA-256 and the time it was written, and the
+files the latest run created or changed are listed separately. Posts also
+carry a hash of their content without the date, so a post that renders the
+same as an earlier one is recognized and not written again.
+
+git gives every file the checkout time, so Jekyll's incremental build would
+regenerate every page. The site build restores the recorded times of files
+whose content didn't change first, and only new or changed pages are built:
+
+    python scripts/site_manifest.py restore-mtimes
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import sys
+import time
+from pathlib import Path
+
+from cache import write_atomic
+
+MANIFEST_VERSION = 1
+# Jekyll doesn't publish files starting with an underscore
+MANIFEST_NAME = "_manifest.json"
+
+
+def file_hash(data):
+    return hashlib.sha256(data).hexdigest()
+
+
+def post_content_hash(markdown):
+    """
+    Hash of a post without the `date:` line of its front matter.
+    """
+    lines = markdown.splitlines(keepends=True)
+    if lines and lines[0].strip() == "---":
+        for i in range(1, len(lines)):
+            if lines[i].strip() == "---":
+                break
+            if lines[i].startswith("date:"):
+                del lines[i]
+                break
+    return file_hash("".join(lines).encode("utf-8"))
+
+
+class SiteManifest:
+    """
+    Manifest at `path`; file paths are relative to its directory (the site root).
+    """
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self.root = self.path.parent
+        # relative path -> {"sha256", "mtime"[, "content"]}
+        self.files = {}
+        # Files created or changed by this run
+        self.changed = []
+        self._load()
+
+    def _load(self):
+        try:
+            data = json.loads(self.path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return
+        if data.get("version") == MANIFEST_VERSION:
+            self.files = data.get("files", {})
+
+    def save(self):
+        data = {"version": MANIFEST_VERSION, "changed": self.changed, "files": self.files}
+        write_atomic(self.path, json.dumps(data, ensure_ascii=False, sort_keys=True, indent=1) + "\n")
+
+    def _relative(self, path):
+        return Path(path).resolve().relative_to(self.root.resolve()).as_posix()
+
+    def record(self, path, data=None, changed=True, now=None):
+        """
+        Record a file's hash (`data`: its bytes, read if not given).
+        Returns True if the file is new or its content changed; with `changed`
+        it is then listed among this run's changes.
+        """
+        name = self._relative(path)
+        if data is None:
+            data = Path(path).read_bytes()
+        digest = file_hash(data)
+        entry = self.files.get(name)
+        if entry is not None and entry["sha256"] == digest:
+            return False
+        entry = {"sha256": digest, "mtime": int(time.time() if now is None else now)}
+        if name.endswith(".md"):
+            entry["content"] = post_content_hash(data.decode("utf-8"))
+        self.files[name] = entry
+        if changed and name not in self.changed:
+            self.changed.append(name)
+        return True
+
+    def track(self, *directories):
+        """
+        Record the files of directories that aren't in the manifest yet (posts
+        written before it existed), without listing them as changed.
+        Returns the number of files added.
+        """
+        added = 0
+        for directory in directories:
+            directory = Path(directory)
+            if not directory.is_dir():
+                continue
+            for path in sorted(directory.rglob("*")):
+                if path.is_file() and not path.name.startswith(("_", ".")) and path.suffix != ".tmp":
+                    if self._relative(path) not in self.files:
+                        added += self.record(path, changed=False, now=path.stat().st_mtime)
+        return added
+
+    def find_content(self, markdown):
+        """
+        Returns the path of a post with the same content as `markdown` (besides
+        the date), or None.
+        """
+        content = post_content_hash(markdown)
+        for name, entry in self.files.items():
+            if entry.get("content") == content:
+                return name
+        return None
+
+    def restore_mtimes(self):
+        """
+        Set the modification time of every listed file whose content still
+        matches to the recorded time. Returns (restored, changed or missing).
+        """
+        restored = skipped = 0
+        for name, entry in self.files.items():
+            path = self.root / name
+            try:
+                matches = file_hash(path.read_bytes()) == entry["sha256"]
+            except OSError:
+                matches = False
+            if matches:
+                os.utime(path, (entry["mtime"], entry["mtime"]))
+                restored += 1
+            else:
+                skipped += 1
+        return restored, skipped
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Manifest of the generated site files.")
+    parser.add_argument("command", choices=["restore-mtimes", "changed"],
+                        help="restore-mtimes: restore recorded file times before an incremental build; "
+                             "changed: list the files changed by the latest run")
+    parser.add_argument("--manifest", default=MANIFEST_NAME, help="manifest file")
+    args = parser.parse_args(argv)
+
+    manifest = SiteManifest(args.manifest)
+    if args.command == "restore-mtimes":
+        restored, skipped = manifest.restore_mtimes()
+        print(f"Restored the modification times of {restored} files ({skipped} changed or missing)")
+    else:
+        try:
+            changed = json.loads(manifest.path.read_text(encoding="utf-8")).get("changed", [])
+        except (OSError, ValueError):
+            changed = []
+        for name in changed:
+            print(name)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,153 @@
+"""
+Vectorized ranking of places by their Google Trends history.
+The stored daily interest of every candidate place (relative to the anchor
+term) is loaded into one keyword x day matrix, and the features ranking
+functions use are computed for all places at once with NumPy:
+
+    latest    last known interest
+    level     recency-weighted mean interest (weights halve every `half_life` days)
+    momentum  mean of the last `short` days against the days before, in [-1, 1]
+    slope     least-squares change of interest per day
+    novelty   0 just after a post about the place, towards 1 as it gets older
+              (1 if never posted)
+
+Missing days are NaN and left out of every feature. A ranking function takes
+the feature table and returns one score per place (higher is better); new ones
+are added with @register_ranker.
+"""
+
+from lazy import LazyModule
+
+np = LazyModule("numpy")
+pd = LazyModule("pandas")
+
+# Days of history ranked on
+WINDOW_DAYS = 90
+# Days after which a day's interest counts half as much in `level`
+HALF_LIFE_DAYS = 14
+# Recent days that `momentum` compares against the rest of the window
+MOMENTUM_DAYS = 7
+# Days after a post over which `novelty` recovers (to 63%)
+NOVELTY_DAYS = 60
+
+FEATURES = ("latest", "level", "momentum", "slope", "novelty")
+
+RANKERS = {}
+
+
+def register_ranker(name):
+    """
+    Decorator registering `func(features) -> scores` under `name`.
+    """
+    def register(func):
+        RANKERS[name] = func
+        return func
+    return register
+
+
+@register_ranker("latest")
+def rank_latest(features):
+    # The previous selection: last known interest only
+    return features["latest"]
+
+
+@register_ranker("level")
+def rank_level(features):
+    return features["level"] * features["novelty"]
+
+
+@register_ranker("blend")
+def rank_blend(features):
+    # Steady interest, boosted while it rises, damped for places posted recently
+    return features["level"] * (1 + features["momentum"].fillna(0)) * features["novelty"]
+
+
+def interest_matrix(rows, keywords, end_day, days=WINDOW_DAYS):
+    """
+    Build the keyword x day matrix of the `days` days up to `end_day` from
+    (keyword, day, relative interest) rows, one per keyword and day. Days
+    without a value are NaN; rows of other keywords or days are ignored.
+    """
+    matrix = np.full((len(keywords), days), np.nan)
+    if not rows:
+        return matrix
+    index = {keyword: i for i, keyword in enumerate(keywords)}
+    positions = np.fromiter((index.get(row[0], -1) for row in rows), dtype="int64", count=len(rows))
+    columns = np.fromiter((row[1] for row in rows), dtype="int64", count=len(rows)) - (end_day - days + 1)
+    values = np.fromiter((row[2] for row in rows), dtype="float64", count=len(rows))
+    keep = (positions >= 0) & (columns >= 0) & (columns < days)
+    matrix[positions[keep], columns[keep]] = values[keep]
+    return matrix
+
+
+def days_since(dates, today):
+    """
+    Days from each 'YYYY-MM-DD' date (or None) to `today` (a day number since 1970),
+    as a float array with NaN for None.
+    """
+    parsed = np.array([date or "NaT" for date in dates], dtype="datetime64[D]")
+    return np.where(np.isnat(parsed), np.nan, today - parsed.view("int64").astype("float64"))
+
+
+def _mean(values, observed):
+    # Row means over the observed cells (NaN for rows without any)
+    counts = observed.sum(axis=1)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return np.where(counts > 0, values.sum(axis=1) / counts, np.nan)
+
+
+def trend_features(matrix, keywords, days_since_post=None, half_life=HALF_LIFE_DAYS,
+                   short=MOMENTUM_DAYS, novelty_days=NOVELTY_DAYS):
+    """
+    Compute the features of every row of an interest matrix in one pass.
+    `days_since_post` holds the days since each place was last posted (NaN:
+    never). Returns a DataFrame indexed by keyword with one column per feature.
+    """
+    matrix = np.asarray(matrix, dtype="float64")
+    rows, days = matrix.shape
+    observed = ~np.isnan(matrix)
+    values = np.where(observed, matrix, 0.0)
+    x = np.arange(days, dtype="float64")
+
+    # Last observed value: carry each row's observations forward to the last day
+    last_seen = np.maximum.accumulate(np.where(observed, np.arange(days), -1), axis=1)[:, -1]
+    latest = np.where(last_seen >= 0, matrix[np.arange(rows), np.maximum(last_seen, 0)], np.nan)
+
+    weights = 0.5 ** ((days - 1 - x) / half_life)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        level = (values * weights).sum(axis=1) / (observed * weights).sum(axis=1)
+
+        recent = _mean(values[:, -short:], observed[:, -short:])
+        before = _mean(values[:, :-short], observed[:, :-short])
+        momentum = (recent - before) / (recent + before)
+
+        counts = observed.sum(axis=1)
+        x_mean = (observed * x).sum(axis=1) / counts
+        y_mean = values.sum(axis=1) / counts
+        dx = np.where(observed, x - x_mean[:, None], 0.0)
+        variance = (dx * dx).sum(axis=1)
+        slope = np.where((counts > 1) & (variance > 0),
+                         (dx * (values - y_mean[:, None])).sum(axis=1) / variance, np.nan)
+
+    if days_since_post is None:
+        novelty = np.ones(rows)
+    else:
+        elapsed = np.asarray(days_since_post, dtype="float64")
+        novelty = np.where(np.isnan(elapsed), 1.0, 1 - np.exp(-np.maximum(elapsed, 0) / novelty_days))
+
+    return pd.DataFrame(
+        {"latest": latest, "level": level, "momentum": momentum, "slope": slope, "novelty": novelty},
+        index=pd.Index(keywords, name="keyword"),
+        columns=list(FEATURES)
+    )
+
+
+def rank_scores(features, ranker="latest"):
+    """
+    Score every place with a ranking function (a registered name or a callable).
+    Returns a Series of scores indexed by keyword; places without enough data are NaN.
+    Raises KeyError for unknown names.
+    """
+    func = ranker if callable(ranker) else RANKERS[ranker]
+    scores = func(features)
+    return pd.Series(np.asarray(scores, dtype="float64"), index=features.index)
@@ -0,0 +1,141 @@
+"""
+Persistent time series of Google Trends scores.
+Each sample is a keyword's interest relative to the anchor term at the time
+it was fetched, so samples from different runs and batches are comparable.
+Only keywords whose latest sample is older than the refresh age are fetched again.
+The daily interest-over-time points of each fetch are kept as well, relative to
+the anchor's mean in the same request; newer fetches replace overlapping days.
+"""
+
+import sqlite3
+import threading
+import time
+from pathlib import Path
+
+
+def display_score(relative):
+    """
+    Convert interest relative to the anchor into a 0-100 score (the anchor scores 50).
+    """
+    return min(100, max(0, int(round(relative * 50))))
+
+
+class TrendStore:
+    """
+    SQLite-backed store of (keyword, anchor, fetched time, relative interest) samples.
+    """
+
+    def __init__(self, path, max_age=7 * 24 * 3600, keep=180 * 24 * 3600):
+        self.path = Path(path)
+        self.max_age = max_age
+        self.keep = keep
+        self._lock = threading.Lock()
+        self._conn = None
+
+    def _connect(self):
+        if self._conn is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self._conn = sqlite3.connect(str(self.path), check_same_thread=False)
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS samples ("
+                " keyword TEXT NOT NULL,"
+                " anchor TEXT NOT NULL,"
+                " fetched REAL NOT NULL,"
+                " relative REAL NOT NULL,"
+                " PRIMARY KEY (keyword, anchor, fetched))"
+            )
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS points ("
+                " keyword TEXT NOT NULL,"
+                " anchor TEXT NOT NULL,"
+                " day INTEGER NOT NULL,"
+                " relative REAL NOT NULL,"
+                " PRIMARY KEY (keyword, anchor, day))"
+            )
+            self._conn.commit()
+        return self._conn
+
+    def add(self, anchor, relatives, fetched=None):
+        """
+        Store one sample per keyword; keywords without a value (None) are skipped.
+        Samples older than `keep` seconds are dropped.
+        """
+        fetched = time.time() if fetched is None else fetched
+        rows = [(k, anchor, fetched, float(v)) for k, v in relatives.items() if v is not None]
+        with self._lock:
+            conn = self._connect()
+            conn.executemany("INSERT OR REPLACE INTO samples VALUES (?, ?, ?, ?)", rows)
+            conn.execute("DELETE FROM samples WHERE fetched < ?", (fetched - self.keep,))
+            conn.commit()
+        return len(rows)
+
+    def add_series(self, anchor, series, now=None):
+        """
+        Store daily points ({keyword: [(day number since 1970, relative interest)]}).
+        Points older than `keep` seconds are dropped.
+        """
+        now = time.time() if now is None else now
+        rows = [(k, anchor, int(day), float(v)) for k, points in series.items() for day, v in points]
+        if not rows:
+            return 0
+        with self._lock:
+            conn = self._connect()
+            conn.executemany("INSERT OR REPLACE INTO points VALUES (?, ?, ?, ?)", rows)
+            conn.execute("DELETE FROM points WHERE day < ?", (int((now - self.keep) // 86400),))
+            conn.commit()
+        return len(rows)
+
+    def daily(self, anchor, since_day):
+        """
+        Returns [(keyword, day, relative interest)] of every keyword from `since_day`
+        on: the stored points, plus one point per sample on the day it was fetched
+        for days without points (samples of runs that didn't keep the series).
+        """
+        with self._lock:
+            conn = self._connect()
+            points = conn.execute(
+                "SELECT keyword, day, relative FROM points WHERE anchor = ? AND day >= ?",
+                (anchor, since_day)
+            ).fetchall()
+            samples = conn.execute(
+                "SELECT keyword, CAST(fetched / 86400 AS INTEGER), relative FROM samples"
+                " WHERE anchor = ? AND fetched >= ? ORDER BY fetched",
+                (anchor, since_day * 86400)
+            ).fetchall()
+        # One value per keyword and day: points first, then the newest sample
+        merged = {(keyword, day): relative for keyword, day, relative in samples}
+        merged.update({(keyword, day): relative for keyword, day, relative in points})
+        return [(keyword, day, relative) for (keyword, day), relative in merged.items()]
+
+    def latest(self, anchor, keywords=None):
+        """
+        Returns a dictionary of keyword -> (fetched time, relative interest) of
+        the newest sample of each keyword.
+        """
+        with self._lock:
+            rows = self._connect().execute(
+                "SELECT keyword, MAX(fetched), relative FROM samples WHERE anchor = ? GROUP BY keyword",
+                (anchor,)
+            ).fetchall()
+        latest = {keyword: (fetched, relative) for keyword, fetched, relative in rows}
+        if keywords is not None:
+            latest = {k: latest[k] for k in keywords if k in latest}
+        return latest
+
+    def stale(self, anchor, keywords, limit=None, now=None):
+        """
+        Keywords that need a refresh: never fetched first, then the ones fetched
+        longest ago, leaving out samples younger than `max_age`. Refreshing a few
+        per run rotates through the whole list.
+        """
+        now = time.time() if now is None else now
+        latest = self.latest(anchor)
+        due = [k for k in dict.fromkeys(keywords) if now - latest.get(k, (0.0,))[0] >= self.max_age]
+        due.sort(key=lambda k: latest.get(k, (0.0,))[0])
+        return due if limit is None else due[:limit]
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
@@ -0,0 +1,190 @@
+"""
+Batched Google Trends scoring.
+Scores many keywords with as few pytrends requests as possible.
+"""
+
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import metrics
+from ratelimit import AdaptiveLimiter, CircuitOpenError, parse_retry_after
+
+# Google Trends compares at most 5 terms per request
+MAX_KEYWORDS_PER_PAYLOAD = 5
+
+
+def build_keyword(place_name, location=""):
+    """
+    Build the Trends search keyword for a place.
+    """
+    if location:
+        return f"{place_name} {location}"
+    return place_name
+
+
+def _is_quiet_error(error):
+    # Don't print rate limiting (429) or network errors to avoid spam
+    error_str = str(error).lower()
+    return "429" in error_str or "timeout" in error_str or "interrupt" in error_str
+
+
+def fetch_interest(client, keywords, timeframe, limiter):
+    """
+    Fetch interest over time for up to 5 keywords through the shared limiter.
+    Rate limited (429) and timed out requests are retried after a pause; other
+    errors are raised.
+    """
+    for attempt in range(limiter.max_retries + 1):
+        limiter.acquire()
+        metrics.count("api_calls.trends")
+        try:
+            client.build_payload(keywords, cat=0, timeframe=timeframe, geo='', gprop='')
+            df = client.interest_over_time()
+        except Exception as e:
+            error_str = str(e).lower()
+            rate_limited = "429" in error_str
+            if rate_limited:
+                metrics.count("rate_limited.trends")
+            elif "timeout" in error_str:
+                metrics.count("timeouts.trends")
+            else:
+                raise
+            # pytrends keeps the response on its errors
+            headers = getattr(getattr(e, "response", None), "headers", None) or {}
+            limiter.record_failure(parse_retry_after(headers.get("Retry-After")), rate_limited)
+            if attempt == limiter.max_retries:
+                raise
+            metrics.count("retries.trends")
+            continue
+        limiter.record_success()
+        return df
+
+
+class TrendScorer:
+    """
+    Scores keywords against Google Trends in batches.
+
+    Every batch includes a shared anchor term. Trends scales each request to its
+    own maximum, so keywords are scored relative to the anchor's interest in the
+    same request, which makes scores from different batches comparable.
+    """
+
+    def __init__(self, client_factory, anchor=None, max_workers=2, rate=0.5, burst=1,
+                 timeframe='today 1-m', limiter=None, keep_frames=False):
+        self.client_factory = client_factory
+        self.anchor = anchor
+        self.max_workers = max(1, int(max_workers))
+        # Pass a shared limiter to pace all Trends requests of the run together
+        self.limiter = limiter or AdaptiveLimiter("trends", rate, burst)
+        self.timeframe = timeframe
+        self._local = threading.local()
+        # Interest-over-time frames of the fetched batches (with keep_frames)
+        self.keep_frames = keep_frames
+        self._frames = []
+        self._frames_lock = threading.Lock()
+
+    def _client(self):
+        # pytrends keeps cookies and a session per object, so use one per worker
+        client = getattr(self._local, "client", None)
+        if client is None:
+            client = self.client_factory()
+            self._local.client = client
+        return client
+
+    def make_batches(self, keywords, anchor):
+        """
+        Split keywords into payloads of at most 5 terms, each starting with the anchor.
+        """
+        others = [k for k in dict.fromkeys(keywords) if k != anchor]
+        size = MAX_KEYWORDS_PER_PAYLOAD - 1
+        batches = [[anchor] + others[i:i + size] for i in range(0, len(others), size)]
+        return batches or [[anchor]]
+
+    def fetch_batch(self, batch):
+        """
+        Fetch interest over time for one batch.
+        Returns a dictionary of keyword -> average interest, or None on error.
+        """
+        try:
+            with metrics.span("trends.batch", keywords=len(batch)):
+                df = fetch_interest(self._client(), batch, self.timeframe, self.limiter)
+        except CircuitOpenError:
+            return None
+        except Exception as e:
+            if not _is_quiet_error(e):
+                print(f"  ⚠️  Error getting trend scores for {', '.join(batch)}: {type(e).__name__}")
+            return None
+
+        if df.empty:
+            return {}
+        if self.keep_frames:
+            with self._frames_lock:
+                self._frames.append((batch, df))
+        return {k: float(df[k].mean()) for k in batch if k in df.columns}
+
+    def relative_series(self, anchor=None):
+        """
+        Turn the frames fetched since the last call into time series relative to
+        the anchor's mean in the same request.
+        Returns a dictionary of keyword -> [(day number since 1970, relative interest)].
+        """
+        anchor = anchor or self.anchor
+        with self._frames_lock:
+            frames, self._frames = self._frames, []
+        series = {}
+        for batch, df in frames:
+            if anchor not in df.columns:
+                continue
+            reference = float(df[anchor].mean())
+            if not reference:
+                continue
+            days = [int(timestamp.timestamp() // 86400) for timestamp in df.index]
+            for keyword in batch:
+                if keyword in df.columns and keyword not in series:
+                    values = (df[keyword] / reference).tolist()
+                    series[keyword] = list(zip(days, values))
+        return series
+
+    def score_relative(self, keywords):
+        """
+        Fetch all keywords and return a dictionary of keyword -> interest relative
+        to the anchor, or None where it couldn't be measured. The values stay
+        comparable across runs as long as the anchor is the same.
+        """
+        keywords = list(dict.fromkeys(keywords))
+        if not keywords:
+            return {}
+
+        anchor = self.anchor or keywords[0]
+        batches, results = self.fetch(keywords, anchor)
+        relatives = {k: None for k in keywords}
+        for batch, means in zip(batches, results):
+            if not means or not means.get(anchor):
+                continue
+            for keyword in batch:
+                if keyword in relatives and relatives[keyword] is None and keyword in means:
+                    relatives[keyword] = means[keyword] / means[anchor]
+        return relatives
+
+    def fetch(self, keywords, anchor):
+        """
+        Fetch every batch of keywords on the worker pool.
+        Returns (batches, results), with None for batches that failed.
+        """
+        batches = self.make_batches(keywords, anchor)
+        results = [None] * len(batches)
+
+        pool = ThreadPoolExecutor(max_workers=min(self.max_workers, len(batches)))
+        futures = [pool.submit(self.fetch_batch, batch) for batch in batches]
+        try:
+            for i, future in enumerate(futures):
+                results[i] = future.result()
+        except KeyboardInterrupt:
+            print("\n⚠️  Interrupted by user. Using scores collected so far...")
+            for i, future in enumerate(futures):
+                if future.done() and not future.cancelled():
+                    results[i] = future.result()
+        finally:
+            pool.shutdown(wait=False, cancel_futures=True)
+
+        return batches, results
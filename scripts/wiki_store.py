@@ -0,0 +1,50 @@
+"""
+Local store of Wikipedia articles used by the post generation script.
+Articles are keyed by their resolved title, search queries remember which
+title they resolved to, and stored articles are revalidated by revision ID.
+"""
+
+
+class WikiStore:
+    """
+    Wikipedia article store on top of a ResponseCache.
+
+    `revision_lookup(title)` returns the current revision ID of a page, or None
+    if it could not be checked (the stored article is then reused as is).
+    """
+
+    def __init__(self, cache, revision_lookup):
+        self.cache = cache
+        self.revision_lookup = revision_lookup
+
+    def resolve(self, query):
+        """
+        Returns the title a search query resolved to before, or None.
+        """
+        return self.cache.get("query:" + query)
+
+    def get(self, query):
+        """
+        Returns the stored article for a search query if it is still current, or None.
+        """
+        title = self.resolve(query)
+        if title is None:
+            return None
+
+        entry = self.cache.get("page:" + title)
+        if entry is None:
+            return None
+
+        # Only the revision ID is fetched; the article itself is not downloaded again
+        revision_id = self.revision_lookup(title)
+        if revision_id is not None and revision_id != entry.get("revision_id"):
+            return None
+        return entry
+
+    def put(self, query, entry):
+        """
+        Store an article (a dictionary with at least `title` and `revision_id`)
+        and remember that the search query resolves to it.
+        """
+        self.cache.set("page:" + entry["title"], entry)
+        self.cache.set("query:" + query, entry["title"])